@@ -0,0 +1,58 @@
+"""
+HTTP caching helpers for API routes
+"""
+from functools import wraps
+from typing import Callable
+from flask import request, make_response
+import hashlib
+
+
+def compute_etag(body: bytes) -> str:
+    """
+    Compute a strong ETag value (without quotes) for a response body
+    
+    MD5 is only used as a fast content fingerprint here, not for security.
+    """
+    return hashlib.md5(body, usedforsecurity=False).hexdigest()
+
+
+def etag_cached(cache_control: str = "public, max-age=300") -> Callable:
+    """
+    Decorator that adds an ETag to successful responses and answers
+    matching If-None-Match requests with an empty 304
+    
+    Responses that already carry an ETag (e.g. prebuilt bodies) are not
+    re-hashed. Streamed and non-200 responses are passed through untouched.
+    
+    Args:
+        cache_control: Cache-Control header to send with cacheable responses
+    
+    Usage:
+        @bp.route("/resource")
+        @etag_cached()
+        def resource():
+            ...
+    """
+    def decorator(f: Callable) -> Callable:
+        @wraps(f)
+        def decorated_function(*args, **kwargs):
+            response = make_response(f(*args, **kwargs))
+            if response.status_code != 200 or response.is_streamed:
+                return response
+            
+            etag, _ = response.get_etag()
+            if etag is None:
+                etag = compute_etag(response.get_data())
+                response.set_etag(etag)
+            response.headers["Cache-Control"] = cache_control
+            
+            if request.if_none_match.contains(etag):
+                not_modified = make_response("", 304)
+                not_modified.set_etag(etag)
+                not_modified.headers["Cache-Control"] = cache_control
+                return not_modified
+            
+            return response
+        
+        return decorated_function
+    return decorator
@@ -2,13 +2,142 @@
 Authentication middleware for API routes
 """
 from functools import wraps
+from typing import Optional, Tuple
 from flask import request, jsonify
-from app.services.security_client import security_client, SecurityServiceError
+import os
+import threading
+import time
+from app.services.security_client import get_security_client, SecurityServiceError
+from app.services.shared_files import private_cache_dir
+from app.services.token_cache import TokenCache
 from app.config import config
 import logging
 
 logger = logging.getLogger(__name__)
 
+# Successful validations, so repeat requests with the same credential
+# skip the round-trip to the security service. API keys and user tokens
+# are cached separately: a burst of distinct user tokens can't evict hot
+# API keys, and key invalidation only has to scan API key entries.
+_api_key_cache = TokenCache(
+    max_size=config.AUTH_CACHE_MAX_SIZE,
+    ttl_seconds=config.AUTH_CACHE_TTL
+)
+# Tokens can be revoked (logout) without a call to the invalidation
+# endpoint, so they get a shorter lifetime
+_token_cache = TokenCache(
+    max_size=config.AUTH_CACHE_MAX_SIZE,
+    ttl_seconds=config.AUTH_TOKEN_CACHE_TTL
+)
+
+# Gunicorn workers don't share memory, so an invalidation received by one
+# worker is signalled to the others on this host by replacing a file in
+# the private cache directory; each worker drops its API key cache when it
+# sees the file change
+_INVALIDATION_FILE_NAME = "auth-invalidated"
+# Seconds between checks of the file, so cache hits don't pay for a stat
+_INVALIDATION_CHECK_INTERVAL = 1.0
+_invalidation_lock = threading.Lock()
+
+# Fixed at startup; read once instead of on every request
+_SECURITY_ENABLED = config.ENABLE_SECURITY_SERVICE
+
+
+def _extract_credentials(headers) -> Tuple[Optional[str], Optional[str]]:
+    """
+    Extract credentials from request headers
+    
+    Args:
+        headers: Incoming request headers
+    
+    Returns:
+        Tuple of (api_key, auth_header). api_key comes from X-API-Key, or
+        from the Authorization header when it carries an API key (or when
+        the security service is disabled and every token is an API key).
+    """
+    # Check for API key first (X-API-Key header or Authorization header with API key)
+    api_key = headers.get("X-API-Key")
+    auth_header = headers.get("Authorization")
+    
+    # If no X-API-Key, check if Authorization header contains an API key
+    if not api_key and auth_header:
+        # Remove Bearer prefix if present
+        token = auth_header.removeprefix("Bearer ").strip()
+        # Check if it's an API key format or if security service is disabled (treat as API key)
+        if not _SECURITY_ENABLED or get_security_client().is_api_key(token):
+            api_key = token
+    
+    return api_key, auth_header
+
+
+def _invalidation_stamp() -> Optional[Tuple[int, int]]:
+    """Identify the current version of the invalidation file, or None if there is none"""
+    directory = private_cache_dir()
+    if directory is None:
+        return None
+    try:
+        info = (directory / _INVALIDATION_FILE_NAME).stat()
+    except OSError:
+        return None
+    return info.st_ino, info.st_mtime_ns
+
+
+_invalidation_seen = _invalidation_stamp()
+_invalidation_checked_at = time.monotonic()
+
+
+def _sync_invalidations() -> None:
+    """Drop the API key cache if another worker has signalled an invalidation"""
+    global _invalidation_seen, _invalidation_checked_at
+    now = time.monotonic()
+    if now - _invalidation_checked_at < _INVALIDATION_CHECK_INTERVAL:
+        return
+    
+    with _invalidation_lock:
+        if now - _invalidation_checked_at < _INVALIDATION_CHECK_INTERVAL:
+            return
+        _invalidation_checked_at = now
+        stamp = _invalidation_stamp()
+        if stamp != _invalidation_seen:
+            _invalidation_seen = stamp
+            _api_key_cache.clear()
+
+
+def _signal_invalidation() -> None:
+    """Replace the invalidation file so every worker on this host notices"""
+    directory = private_cache_dir()
+    if directory is None:
+        raise OSError("no private cache directory")
+    path = directory / _INVALIDATION_FILE_NAME
+    # A fresh inode on every signal, so the change is seen even when the
+    # filesystem's mtime resolution is coarse
+    tmp_path = path.with_name(f"{path.name}.{os.getpid()}.{threading.get_ident()}")
+    os.close(os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600))
+    os.replace(tmp_path, path)
+
+
+def invalidate_cached_keys(key_ids) -> int:
+    """
+    Remove cached validations for revoked or rotated API keys
+    
+    Entries are removed from this worker's cache directly; the other
+    workers on the same host drop their whole API key cache within about
+    a second (on their next API key request after that). Other hosts (e.g. further Cloud Run instances) are not
+    reached and keep their entries until AUTH_CACHE_TTL expires.
+    
+    Args:
+        key_ids: API key IDs to invalidate
+    
+    Returns:
+        Number of cache entries removed from this worker's cache
+    """
+    removed = _api_key_cache.invalidate_many(key_ids)
+    try:
+        _signal_invalidation()
+    except OSError as e:
+        logger.warning("Could not signal API key invalidation to other workers: %s", e)
+    return removed
+
 
 def require_auth(f):
     """
@@ -22,31 +151,43 @@ def require_auth(f):
     """
     @wraps(f)
     def decorated_function(*args, **kwargs):
-        # Check for API key first (X-API-Key header or Authorization header with API key)
-        api_key = request.headers.get("X-API-Key")
-        auth_header = request.headers.get("Authorization")
+        api_key, auth_header = _extract_credentials(request.headers)
         
-        # If no X-API-Key, check if Authorization header contains an API key
-        if not api_key and auth_header:
-            # Remove Bearer prefix if present
-            token = auth_header.replace("Bearer ", "").strip()
-            # Check if it's an API key format or if security service is disabled (treat as API key)
-            if not config.ENABLE_SECURITY_SERVICE or security_client.is_api_key(token):
-                api_key = token
+        # Standalone mode: the hardcoded key is the only valid credential,
+        # so check it directly, skipping the cache and the validation path
+        if api_key and not _SECURITY_ENABLED:
+            try:
+                key_info = get_security_client().validate_hardcoded_api_key(api_key)
+            except SecurityServiceError as e:
+                logger.error("API key validation failed: %s", e)
+                return jsonify({
+                    "error": "Authentication failed",
+                    "message": str(e)
+                }), 401
+            
+            request.user_id = key_info["keyId"]
+            request.user_info = key_info
+            request.auth_type = "api_key"
+            return f(*args, **kwargs)
         
         # If API key found, validate it
         if api_key:
             try:
-                logger.debug(f"Validating API key for path: {request.path}, method: {request.method}")
-                validation_result = security_client.validate_api_key(
-                    api_key=api_key,
-                    resource_path=request.path,
-                    http_method=request.method
-                )
+                _sync_invalidations()
+                cache_key = TokenCache.make_key(api_key, request.path, request.method)
+                hit, validation_result = _api_key_cache.get(cache_key)
+                if not hit:
+                    logger.debug("Validating API key for path: %s, method: %s", request.path, request.method)
+                    validation_result = get_security_client().validate_api_key(
+                        api_key=api_key,
+                        resource_path=request.path,
+                        http_method=request.method
+                    )
+                    _api_key_cache.set(cache_key, validation_result)
                 
                 # Extract key ID from validation result
                 key_id = validation_result.get("keyId")
-                logger.debug(f"API key validated successfully: {key_id}")
+                logger.debug("API key validated successfully: %s", key_id)
                 
                 # Store key info in request context
                 request.user_id = key_id  # Use keyId as user_id equivalent
@@ -56,21 +197,21 @@ def require_auth(f):
                 return f(*args, **kwargs)
             
             except SecurityServiceError as e:
-                logger.error(f"API key validation failed: {str(e)}")
+                logger.error("API key validation failed: %s", e)
                 return jsonify({
                     "error": "Authentication failed",
                     "message": str(e)
                 }), 401
             
             except Exception as e:
-                logger.error(f"Unexpected API key validation error: {str(e)}", exc_info=True)
+                logger.error("Unexpected API key validation error: %s", e, exc_info=True)
                 return jsonify({
                     "error": "Authentication error",
                     "message": f"Unexpected error: {str(e)}"
                 }), 500
         
         # Fall back to JWT/session token validation (only if security service is enabled)
-        if not config.ENABLE_SECURITY_SERVICE:
+        if not _SECURITY_ENABLED:
             return jsonify({
                 "error": "Authentication required",
                 "message": "Missing X-API-Key header or Authorization header with API key"
@@ -82,22 +223,26 @@ def require_auth(f):
                 "message": "Missing Authorization header or X-API-Key header"
             }), 401
         
-        # Extract token (keep Bearer prefix, security_client will handle it)
+        # Extract token (keep Bearer prefix, the security client will handle it)
         token = auth_header
         
         # Validate token with security service
         try:
-            logger.debug(f"Validating token for path: {request.path}, method: {request.method}")
-            # Use the current request path and method for validation
-            validation_result = security_client.validate_token(
-                token=token,
-                path=request.path,
-                method=request.method
-            )
+            cache_key = TokenCache.make_key(token, request.path, request.method)
+            hit, validation_result = _token_cache.get(cache_key)
+            if not hit:
+                logger.debug("Validating token for path: %s, method: %s", request.path, request.method)
+                # Use the current request path and method for validation
+                validation_result = get_security_client().validate_token(
+                    token=token,
+                    path=request.path,
+                    method=request.method
+                )
+                _token_cache.set(cache_key, validation_result, token=token)
             
             # Extract user ID from validation result
             user_id = validation_result.get("userId")
-            logger.debug(f"Token validated successfully for user: {user_id}")
+            logger.debug("Token validated successfully for user: %s", user_id)
             
             # Store user info in request context
             request.user_id = user_id
@@ -108,9 +253,9 @@ def require_auth(f):
         
         except SecurityServiceError as e:
             # Log the error for debugging
-            logger.error(f"Security service validation failed: {str(e)}")
-            logger.error(f"Path: {request.path}, Method: {request.method}")
-            logger.error(f"Authorization header present: {bool(auth_header)}")
+            logger.error("Security service validation failed: %s", e)
+            logger.error("Path: %s, Method: %s", request.path, request.method)
+            logger.error("Authorization header present: %s", bool(auth_header))
             return jsonify({
                 "error": "Authentication failed",
                 "message": str(e)
@@ -118,7 +263,7 @@ def require_auth(f):
         
         except Exception as e:
             # Log unexpected errors
-            logger.error(f"Unexpected authentication error: {str(e)}", exc_info=True)
+            logger.error("Unexpected authentication error: %s", e, exc_info=True)
             return jsonify({
                 "error": "Authentication error",
                 "message": f"Unexpected error: {str(e)}"
@@ -139,25 +284,21 @@ def optional_auth(f):
     """
     @wraps(f)
     def decorated_function(*args, **kwargs):
-        # Check for API key first
-        api_key = request.headers.get("X-API-Key")
-        auth_header = request.headers.get("Authorization")
-        
-        # If no X-API-Key, check if Authorization header contains an API key
-        if not api_key and auth_header:
-            token = auth_header.replace("Bearer ", "").strip()
-            # Check if it's an API key format or if security service is disabled (treat as API key)
-            if not config.ENABLE_SECURITY_SERVICE or security_client.is_api_key(token):
-                api_key = token
+        api_key, auth_header = _extract_credentials(request.headers)
         
         # If API key found, validate it
         if api_key:
             try:
-                validation_result = security_client.validate_api_key(
-                    api_key=api_key,
-                    resource_path=request.path,
-                    http_method=request.method
-                )
+                _sync_invalidations()
+                cache_key = TokenCache.make_key(api_key, request.path, request.method)
+                hit, validation_result = _api_key_cache.get(cache_key)
+                if not hit:
+                    validation_result = get_security_client().validate_api_key(
+                        api_key=api_key,
+                        resource_path=request.path,
+                        http_method=request.method
+                    )
+                    _api_key_cache.set(cache_key, validation_result)
                 key_id = validation_result.get("keyId")
                 request.user_id = key_id
                 request.user_info = validation_result
@@ -166,14 +307,18 @@ def optional_auth(f):
                 # Silently fail for optional auth
                 pass
         # Fall back to JWT/session token validation (only if security service is enabled)
-        elif auth_header and config.ENABLE_SECURITY_SERVICE:
+        elif auth_header and _SECURITY_ENABLED:
             token = auth_header
             try:
-                validation_result = security_client.validate_token(
-                    token=token,
-                    path=request.path,
-                    method=request.method
-                )
+                cache_key = TokenCache.make_key(token, request.path, request.method)
+                hit, validation_result = _token_cache.get(cache_key)
+                if not hit:
+                    validation_result = get_security_client().validate_token(
+                        token=token,
+                        path=request.path,
+                        method=request.method
+                    )
+                    _token_cache.set(cache_key, validation_result, token=token)
                 user_id = validation_result.get("userId")
                 request.user_id = user_id
                 request.user_info = validation_result
@@ -3,57 +3,164 @@ Chat API routes
 """
 from flask import Blueprint, request, jsonify, Response, stream_with_context
 from app.api.middleware import require_auth
-from app.services.ai_service import ai_service
+from app.services.ai_service import get_ai_service
 from app.models.requests import ChatRequest
 from app.models.responses import ChatResponse
 from app.config import config
-import json
+from typing import Iterable, Iterator, List, Union
+import orjson
+import queue
+import threading
+import time
 
 chat_bp = Blueprint("chat", __name__)
 
+# Pre-encoded Server-Sent Events framing
+_DONE_FRAME = b'data: {"type":"done"}\n\n'
+_CHUNK_FRAME_PREFIX = b'data: {"type":"chunk","content":'
+_CHUNK_FRAME_SUFFIX = b'}\n\n'
 
-@chat_bp.route("/chat", methods=["POST"])
-@require_auth
-def chat():
+
+# Streamed frames are coalesced into fewer socket writes: flush once the
+# buffer passes this size or this long has passed since the last flush
+_STREAM_FLUSH_BYTES = 4096
+_STREAM_FLUSH_INTERVAL = 0.05
+# Queued by the reader thread after the last frame
+_STREAM_END = object()
+
+
+def _sse_frame(payload: dict) -> bytes:
+    """Encode a payload as a single Server-Sent Events data frame"""
+    return b"data: " + orjson.dumps(payload) + b"\n\n"
+
+
+def _chunk_frame(text: str) -> bytes:
+    """Encode a piece of generated text as an SSE chunk frame"""
+    return _CHUNK_FRAME_PREFIX + orjson.dumps(text) + _CHUNK_FRAME_SUFFIX
+
+
+def _buffer_frames(items: Iterable[Union[bytes, str]], coalesce: bool = False) -> Iterator[bytes]:
     """
-    Non-streaming chat endpoint
+    Coalesce SSE frames into larger writes
     
-    Request body (new format with conversation history):
-        {
-            "messages": [
-                {"role": "user", "content": "Hello!"},
-                {"role": "assistant", "content": "Hi there!"},
-                {"role": "user", "content": "How are you?"}
-            ],
-            "model": "llama3.2:1b",  # optional
-            "provider": "ollama",     # optional
-            "max_context_messages": 20  # optional, default: 20
-        }
+    Items are pulled from the provider stream on a helper thread, so the
+    time threshold is honored even while the provider is silent. The
+    first item is flushed immediately; after that items are held until
+    the buffer passes _STREAM_FLUSH_BYTES or _STREAM_FLUSH_INTERVAL has
+    passed since the last flush, whichever comes first.
     
-    Request body (legacy format - still supported):
-        {
-            "prompt": "Hello, how are you?",
-            "model": "llama3.2:1b",  # optional
-            "provider": "ollama"      # optional
-        }
+    Args:
+        items: Encoded frames (bytes) and generated text chunks (str)
+        coalesce: Send consecutive text chunks held in one flush as a
+            single chunk frame instead of one frame per chunk
+    """
+    pending: "queue.Queue" = queue.Queue()
+    stop = threading.Event()
+    
+    def read() -> None:
+        """Move items onto the queue until the stream ends or the client goes away"""
+        try:
+            for item in items:
+                pending.put(item)
+                if stop.is_set():
+                    break
+        except Exception as e:
+            pending.put(e)
+        finally:
+            close = getattr(items, "close", None)
+            if close is not None:
+                close()
+            pending.put(_STREAM_END)
+    
+    threading.Thread(target=read, name="sse-reader", daemon=True).start()
+    
+    buffer = bytearray()
+    # Text chunks not yet framed (only used when coalescing)
+    text: List[str] = []
+    text_size = 0
+    
+    def frame_text() -> None:
+        """Append the held text to the buffer as one chunk frame"""
+        nonlocal text_size
+        if text:
+            buffer.extend(_chunk_frame("".join(text)))
+            text.clear()
+            text_size = 0
+    
+    def take() -> bytes:
+        """Frame any held text and empty the buffer"""
+        frame_text()
+        data = bytes(buffer)
+        buffer.clear()
+        return data
+    
+    last_flush = float("-inf")
+    try:
+        while True:
+            timeout = None
+            if buffer or text:
+                timeout = max(last_flush + _STREAM_FLUSH_INTERVAL - time.monotonic(), 0)
+            
+            try:
+                item = pending.get(timeout=timeout)
+            except queue.Empty:
+                # Nothing new within the interval: send what is buffered
+                yield take()
+                last_flush = time.monotonic()
+                continue
+            
+            if item is _STREAM_END:
+                break
+            if isinstance(item, Exception):
+                raise item
+            
+            if isinstance(item, str):
+                if coalesce:
+                    text.append(item)
+                    text_size += len(item)
+                else:
+                    buffer += _chunk_frame(item)
+            else:
+                # Keep frames in order: close the text run first
+                frame_text()
+                buffer += item
+            
+            now = time.monotonic()
+            if len(buffer) + text_size > _STREAM_FLUSH_BYTES or now - last_flush >= _STREAM_FLUSH_INTERVAL:
+                yield take()
+                last_flush = now
+        
+        if buffer or text:
+            yield take()
+    finally:
+        # Stops the reader after its current item if the client disconnected
+        stop.set()
+
+
+def _handle_chat(body: bytes) -> Response:
+    """
+    Run a non-streaming chat request
+    
+    Shared by the authenticated and anonymous endpoints.
+    
+    Args:
+        body: Raw JSON request body
     
     Returns:
-        {
-            "response": "I'm doing well, thank you!",
-            "model": "llama3.2:1b",
-            "provider": "ollama"
-        }
+        JSON chat response, or an error response
     """
     try:
-        # Parse and validate request
-        data = request.get_json()
-        if not data:
+        if not body:
             return jsonify({"error": "Request body is required"}), 400
         
-        chat_request = ChatRequest(**data)
+        # Parse and validate request straight from the raw body
+        chat_request = ChatRequest.model_validate_json(body)
         
         # Get provider
-        provider = ai_service.get_provider(chat_request.provider)
+        provider = get_ai_service().get_provider(chat_request.provider)
+        
+        # Resolve the model once so the provider doesn't look up its default again
+        used_model = chat_request.model or provider.get_default_model()
         
         # Get messages (with context limiting applied)
         messages = chat_request.get_messages()
@@ -61,12 +168,9 @@ def chat():
         # Generate response
         response_text = provider.generate_response(
             messages=messages,
-            model=chat_request.model
+            model=used_model
         )
         
-        # Get the model that was actually used
-        used_model = chat_request.model or provider.get_default_model()
-        
         # Build response
         chat_response = ChatResponse(
             response=response_text,
@@ -74,7 +178,11 @@ def chat():
             provider=provider.name
         )
         
-        return jsonify(chat_response.dict()), 200
+        return Response(
+            orjson.dumps(chat_response.model_dump(mode="json")),
+            status=200,
+            mimetype="application/json"
+        )
     
     except ValueError as e:
         return jsonify({"error": "Invalid request", "message": str(e)}), 400
@@ -82,44 +190,27 @@ def chat():
         return jsonify({"error": "Generation failed", "message": str(e)}), 500
 
 
-@chat_bp.route("/chat/stream", methods=["POST"])
-@require_auth
-def chat_stream():
+def _handle_chat_stream(body: bytes) -> Response:
     """
-    Streaming chat endpoint (Server-Sent Events)
+    Run a streaming chat request as Server-Sent Events
     
-    Request body (new format with conversation history):
-        {
-            "messages": [
-                {"role": "user", "content": "Hello!"},
-                {"role": "assistant", "content": "Hi there!"},
-                {"role": "user", "content": "How are you?"}
-            ],
-            "model": "llama3.2:1b",  # optional
-            "provider": "ollama",     # optional
-            "max_context_messages": 20  # optional, default: 20
-        }
+    Shared by the authenticated and anonymous endpoints.
     
-    Request body (legacy format - still supported):
-        {
-            "prompt": "Hello, how are you?",
-            "model": "llama3.2:1b",  # optional
-            "provider": "ollama"      # optional
-        }
+    Args:
+        body: Raw JSON request body
     
     Returns:
-        Server-Sent Events stream with chunks
+        Event stream response, or an error response
     """
     try:
-        # Parse and validate request
-        data = request.get_json()
-        if not data:
+        if not body:
             return jsonify({"error": "Request body is required"}), 400
         
-        chat_request = ChatRequest(**data)
+        # Parse and validate request straight from the raw body
+        chat_request = ChatRequest.model_validate_json(body)
         
         # Get provider
-        provider = ai_service.get_provider(chat_request.provider)
+        provider = get_ai_service().get_provider(chat_request.provider)
         
         # Get the model that will be used
         used_model = chat_request.model or provider.get_default_model()
@@ -127,43 +218,38 @@ def chat_stream():
         # Get messages (with context limiting applied)
         messages = chat_request.get_messages()
         
+        # Metadata is fixed for the whole stream; encode it once up front
+        metadata_frame = _sse_frame({
+            "type": "metadata",
+            "model": used_model,
+            "provider": provider.name
+        })
+        
         def generate():
             """Generator function for streaming response"""
             try:
                 # Send initial metadata
-                metadata = {
-                    "type": "metadata",
-                    "model": used_model,
-                    "provider": provider.name
-                }
-                yield f"data: {json.dumps(metadata)}\n\n"
+                yield metadata_frame
                 
                 # Stream response chunks
                 for chunk in provider.stream_response(
                     messages=messages,
-                    model=chat_request.model
+                    model=used_model
                 ):
-                    chunk_data = {
-                        "type": "chunk",
-                        "content": chunk
-                    }
-                    yield f"data: {json.dumps(chunk_data)}\n\n"
+                    # Framed by _buffer_frames, which may merge adjacent chunks
+                    yield chunk
                 
                 # Send completion signal
-                completion = {
-                    "type": "done"
-                }
-                yield f"data: {json.dumps(completion)}\n\n"
+                yield _DONE_FRAME
             
             except Exception as e:
-                error_data = {
+                yield _sse_frame({
                     "type": "error",
                     "message": str(e)
-                }
-                yield f"data: {json.dumps(error_data)}\n\n"
+                })
         
         return Response(
-            stream_with_context(generate()),
+            stream_with_context(_buffer_frames(generate(), config.COALESCE_STREAMS)),
             mimetype="text/event-stream",
             headers={
                 "Cache-Control": "no-cache",
@@ -178,6 +264,72 @@ def chat_stream():
         return jsonify({"error": "Streaming failed", "message": str(e)}), 500
 
 
+@chat_bp.route("/chat", methods=["POST"])
+@require_auth
+def chat():
+    """
+    Non-streaming chat endpoint
+    
+    Request body (new format with conversation history):
+        {
+            "messages": [
+                {"role": "user", "content": "Hello!"},
+                {"role": "assistant", "content": "Hi there!"},
+                {"role": "user", "content": "How are you?"}
+            ],
+            "model": "llama3.2:1b",  # optional
+            "provider": "ollama",     # optional
+            "max_context_messages": 20  # optional, default: 20
+        }
+    
+    Request body (legacy format - still supported):
+        {
+            "prompt": "Hello, how are you?",
+            "model": "llama3.2:1b",  # optional
+            "provider": "ollama"      # optional
+        }
+    
+    Returns:
+        {
+            "response": "I'm doing well, thank you!",
+            "model": "llama3.2:1b",
+            "provider": "ollama"
+        }
+    """
+    return _handle_chat(request.get_data())
+
+
+@chat_bp.route("/chat/stream", methods=["POST"])
+@require_auth
+def chat_stream():
+    """
+    Streaming chat endpoint (Server-Sent Events)
+    
+    Request body (new format with conversation history):
+        {
+            "messages": [
+                {"role": "user", "content": "Hello!"},
+                {"role": "assistant", "content": "Hi there!"},
+                {"role": "user", "content": "How are you?"}
+            ],
+            "model": "llama3.2:1b",  # optional
+            "provider": "ollama",     # optional
+            "max_context_messages": 20  # optional, default: 20
+        }
+    
+    Request body (legacy format - still supported):
+        {
+            "prompt": "Hello, how are you?",
+            "model": "llama3.2:1b",  # optional
+            "provider": "ollama"      # optional
+        }
+    
+    Returns:
+        Server-Sent Events stream with chunks
+    """
+    return _handle_chat_stream(request.get_data())
+
+
 # Anonymous endpoints (no authentication required)
 # Only available when ENABLE_ANONYMOUS_ACCESS=true
 
@@ -196,32 +348,7 @@ def chat_anonymous():
         }), 403
     
     # Use the same logic as the authenticated endpoint
-    try:
-        data = request.get_json()
-        if not data:
-            return jsonify({"error": "Request body is required"}), 400
-        
-        chat_request = ChatRequest(**data)
-        provider = ai_service.get_provider(chat_request.provider)
-        messages = chat_request.get_messages()
-        response_text = provider.generate_response(
-            messages=messages,
-            model=chat_request.model
-        )
-        used_model = chat_request.model or provider.get_default_model()
-        
-        chat_response = ChatResponse(
-            response=response_text,
-            model=used_model,
-            provider=provider.name
-        )
-        
-        return jsonify(chat_response.dict()), 200
-    
-    except ValueError as e:
-        return jsonify({"error": "Invalid request", "message": str(e)}), 400
-    except Exception as e:
-        return jsonify({"error": "Generation failed", "message": str(e)}), 500
+    return _handle_chat(request.get_data())
 
 
 @chat_bp.route("/chat/stream/anonymous", methods=["POST"])
@@ -238,57 +365,4 @@ def chat_stream_anonymous():
             "message": "This endpoint is not available. Use /api/v1/chat/stream with authentication."
         }), 403
     
-    try:
-        data = request.get_json()
-        if not data:
-            return jsonify({"error": "Request body is required"}), 400
-        
-        chat_request = ChatRequest(**data)
-        provider = ai_service.get_provider(chat_request.provider)
-        used_model = chat_request.model or provider.get_default_model()
-        messages = chat_request.get_messages()
-        
-        def generate():
-            try:
-                metadata = {
-                    "type": "metadata",
-                    "model": used_model,
-                    "provider": provider.name
-                }
-                yield f"data: {json.dumps(metadata)}\n\n"
-                
-                for chunk in provider.stream_response(
-                    messages=messages,
-                    model=chat_request.model
-                ):
-                    chunk_data = {
-                        "type": "chunk",
-                        "content": chunk
-                    }
-                    yield f"data: {json.dumps(chunk_data)}\n\n"
-                
-                completion = {"type": "done"}
-                yield f"data: {json.dumps(completion)}\n\n"
-            
-            except Exception as e:
-                error_data = {
-                    "type": "error",
-                    "message": str(e)
-                }
-                yield f"data: {json.dumps(error_data)}\n\n"
-        
-        return Response(
-            stream_with_context(generate()),
-            mimetype="text/event-stream",
-            headers={
-                "Cache-Control": "no-cache",
-                "Connection": "keep-alive",
-                "X-Accel-Buffering": "no"
-            }
-        )
-    
-    except ValueError as e:
-        return jsonify({"error": "Invalid request", "message": str(e)}), 400
-    except Exception as e:
-        return jsonify({"error": "Streaming failed", "message": str(e)}), 500
-
+    return _handle_chat_stream(request.get_data())
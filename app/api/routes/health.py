@@ -1,12 +1,26 @@
 """
 Health check API routes
 """
-from flask import Blueprint, jsonify
+from flask import Blueprint, Response
+from typing import Optional, Tuple
 from app.models.responses import HealthResponse, DetailedHealthResponse
-from app.services.ai_service import ai_service
+from app.services.ai_service import get_ai_service
+import orjson
+import time
 
 health_bp = Blueprint("health", __name__)
 
+# Basic health is constant; serialize it once
+_HEALTH_BODY = orjson.dumps(HealthResponse(
+    status="healthy",
+    service="ai-service"
+).model_dump())
+
+# Detailed health is served from this cache for at most a second so
+# frequent probes don't fan out to every provider: (body, expires_at)
+_DETAILED_HEALTH_TTL = 1.0
+_detailed_health_cache: Optional[Tuple[bytes, float]] = None
+
 
 @health_bp.route("/health", methods=["GET"])
 def health():
@@ -19,11 +33,7 @@ def health():
             "service": "ai-service"
         }
     """
-    response = HealthResponse(
-        status="healthy",
-        service="ai-service"
-    )
-    return jsonify(response.dict()), 200
+    return Response(_HEALTH_BODY, status=200, mimetype="application/json")
 
 
 @health_bp.route("/health", methods=["GET"], endpoint="detailed_health")
@@ -47,23 +57,26 @@ def detailed_health():
             }
         }
     """
+    global _detailed_health_cache
+    
+    cached = _detailed_health_cache
+    if cached is not None and time.monotonic() < cached[1]:
+        return Response(cached[0], status=200, mimetype="application/json")
+    
     providers_status = {}
     
-    # Check each provider
-    for provider_name in ai_service.get_available_providers():
-        try:
-            provider = ai_service.get_provider(provider_name)
-            models = provider.get_available_models()
-            
+    # Check all providers concurrently
+    for provider_name, models, default, error in get_ai_service().fetch_provider_models():
+        if error is None:
             providers_status[provider_name] = {
                 "available": True,
                 "models_count": len(models),
-                "default_model": provider.get_default_model()
+                "default_model": default
             }
-        except Exception as e:
+        else:
             providers_status[provider_name] = {
                 "available": False,
-                "error": str(e)
+                "error": str(error)
             }
     
     # Determine overall status
@@ -79,5 +92,7 @@ def detailed_health():
         providers=providers_status
     )
     
-    return jsonify(response.dict()), 200
+    body = orjson.dumps(response.model_dump())
+    _detailed_health_cache = (body, time.monotonic() + _DETAILED_HEALTH_TTL)
+    return Response(body, status=200, mimetype="application/json")
 
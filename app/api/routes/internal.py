@@ -0,0 +1,47 @@
+"""
+Internal API routes (service-to-service, not for clients)
+"""
+from flask import Blueprint, request, jsonify
+from app.api.middleware import invalidate_cached_keys
+from app.config import config
+import hmac
+
+internal_bp = Blueprint("internal", __name__)
+
+
+@internal_bp.route("/internal/auth/invalidate", methods=["POST"])
+def invalidate_auth_cache():
+    """
+    Drop cached validations for revoked or rotated API keys
+    
+    Called by the security service when keys change; the other workers
+    on this host are signalled to drop their cached keys. Requires the
+    X-Internal-Secret header to match AUTH_INVALIDATION_SECRET; the
+    endpoint is disabled when no secret is configured.
+    
+    Request body:
+        ["key-id-1", "key-id-2"]
+    
+    Returns:
+        {
+            "invalidated": 3  # entries removed from this worker's cache
+        }
+    """
+    if not config.AUTH_INVALIDATION_SECRET:
+        return jsonify({"error": "Not found"}), 404
+    
+    secret = request.headers.get("X-Internal-Secret", "")
+    if not hmac.compare_digest(secret.encode("utf-8"), config.AUTH_INVALIDATION_SECRET.encode("utf-8")):
+        return jsonify({
+            "error": "Authentication failed",
+            "message": "Invalid internal secret"
+        }), 401
+    
+    key_ids = request.get_json(silent=True)
+    if not isinstance(key_ids, list) or not all(isinstance(key_id, str) for key_id in key_ids):
+        return jsonify({
+            "error": "Invalid request",
+            "message": "Request body must be a JSON array of key IDs"
+        }), 400
+    
+    return jsonify({"invalidated": invalidate_cached_keys(key_ids)}), 200
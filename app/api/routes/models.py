@@ -3,69 +3,45 @@ Models API routes
 """
 from flask import Blueprint, request, jsonify
 from app.api.middleware import require_auth
-from app.services.ai_service import ai_service
+from app.api.caching import etag_cached
+from app.services.ai_service import get_ai_service
 from app.models.responses import ProviderModelsResponse, AllModelsResponse
 from app.config import config
+from typing import Optional
+import logging
+
+logger = logging.getLogger(__name__)
 
 models_bp = Blueprint("models", __name__)
 
 
-@models_bp.route("/models", methods=["GET"])
-@require_auth
-def get_models():
+def _build_models_response(provider_filter: Optional[str], force_refresh: bool):
     """
-    Get available models
+    Build the /models response
     
-    Query params:
-        provider: Filter by provider (ollama or gemini) - optional
-        refresh: Force refresh of cached models (true/false) - optional
+    Shared by the authenticated and anonymous endpoints.
+    
+    Args:
+        provider_filter: Only return this provider's models (optional)
+        force_refresh: Bypass cached model listings
     
     Returns:
-        If provider specified:
-        {
-            "provider": "ollama",
-            "models": ["llama3.2:1b", "mistral:7b"],
-            "default": "llama3.2:1b"
-        }
-        
-        If no provider specified:
-        {
-            "providers": [
-                {
-                    "provider": "ollama",
-                    "models": ["llama3.2:1b"],
-                    "default": "llama3.2:1b"
-                },
-                {
-                    "provider": "gemini",
-                    "models": ["gemini-2.0-flash", "gemini-pro"],
-                    "default": "gemini-2.0-flash"
-                }
-            ]
-        }
+        Flask response tuple
     """
     try:
-        provider_filter = request.args.get("provider")
-        force_refresh = request.args.get("refresh", "false").lower() == "true"
-        
         # If provider is specified, return only that provider's models
         if provider_filter:
             provider_filter = provider_filter.lower()
             
-            if not ai_service.is_provider_available(provider_filter):
+            if not get_ai_service().is_provider_available(provider_filter):
                 return jsonify({
                     "error": "Provider not found",
                     "message": f"Provider '{provider_filter}' is not available"
                 }), 404
             
-            provider = ai_service.get_provider(provider_filter)
-            # Use force_refresh if supported (both Ollama and Gemini support it)
-            try:
-                models = provider.get_available_models(force_refresh=force_refresh)
-            except TypeError:
-                # Fallback for providers that don't support force_refresh parameter
-                models = provider.get_available_models()
-            default = provider.get_default_model()
+            _, models, default, error = get_ai_service().fetch_provider_models(force_refresh, [provider_filter])[0]
+            if error is not None:
+                raise error
             
             response = ProviderModelsResponse(
                 provider=provider_filter,
@@ -77,33 +53,20 @@ def get_models():
         
         # Otherwise, return all providers
         providers_data = []
-        available_providers = ai_service.get_available_providers()
+        available_providers = get_ai_service().get_available_providers()
         
-        # Log which providers are available
-        print(f"[Models API] Available providers: {available_providers}")
+        logger.debug("Available providers: %s", available_providers)
         
-        for provider_name in available_providers:
-            try:
-                provider = ai_service.get_provider(provider_name)
-                # Use force_refresh if supported (both Ollama and Gemini support it)
-                try:
-                    models = provider.get_available_models(force_refresh=force_refresh)
-                except TypeError:
-                    # Fallback for providers that don't support force_refresh parameter
-                    models = provider.get_available_models()
-                default = provider.get_default_model()
-                
+        for provider_name, models, default, error in get_ai_service().fetch_provider_models(force_refresh, available_providers):
+            if error is None:
                 providers_data.append(ProviderModelsResponse(
                     provider=provider_name,
                     models=models,
                     default=default
                 ))
-            except Exception as e:
+            else:
                 # Log error but don't skip - include error info in response
-                import traceback
-                error_msg = f"Failed to get models for {provider_name}: {str(e)}"
-                print(f"Warning: {error_msg}")
-                print(traceback.format_exc())
+                logger.warning("Failed to get models for %s: %s", provider_name, error, exc_info=error)
                 # Still include the provider but with empty models list
                 providers_data.append(ProviderModelsResponse(
                     provider=provider_name,
@@ -121,6 +84,52 @@ def get_models():
         }), 500
 
 
+def _models_query_args():
+    """Read the provider filter and refresh flag from the query string"""
+    return (
+        request.args.get("provider"),
+        request.args.get("refresh", "false").lower() == "true"
+    )
+
+
+@models_bp.route("/models", methods=["GET"])
+@require_auth
+@etag_cached("private, max-age=60")
+def get_models():
+    """
+    Get available models
+    
+    Query params:
+        provider: Filter by provider (ollama or gemini) - optional
+        refresh: Force refresh of cached models (true/false) - optional
+    
+    Returns:
+        If provider specified:
+        {
+            "provider": "ollama",
+            "models": ["llama3.2:1b", "mistral:7b"],
+            "default": "llama3.2:1b"
+        }
+        
+        If no provider specified:
+        {
+            "providers": [
+                {
+                    "provider": "ollama",
+                    "models": ["llama3.2:1b"],
+                    "default": "llama3.2:1b"
+                },
+                {
+                    "provider": "gemini",
+                    "models": ["gemini-2.0-flash", "gemini-pro"],
+                    "default": "gemini-2.0-flash"
+                }
+            ]
+        }
+    """
+    return _build_models_response(*_models_query_args())
+
+
 # Anonymous endpoint (no authentication required)
 # Only available when ENABLE_ANONYMOUS_ACCESS=true
 
@@ -139,68 +148,4 @@ def get_models_anonymous():
         }), 403
     
     # Use the same logic as the authenticated endpoint
-    try:
-        provider_filter = request.args.get("provider")
-        force_refresh = request.args.get("refresh", "false").lower() == "true"
-        
-        if provider_filter:
-            provider_filter = provider_filter.lower()
-            
-            if not ai_service.is_provider_available(provider_filter):
-                return jsonify({
-                    "error": "Provider not found",
-                    "message": f"Provider '{provider_filter}' is not available"
-                }), 404
-            
-            provider = ai_service.get_provider(provider_filter)
-            try:
-                models = provider.get_available_models(force_refresh=force_refresh)
-            except TypeError:
-                models = provider.get_available_models()
-            default = provider.get_default_model()
-            
-            response = ProviderModelsResponse(
-                provider=provider_filter,
-                models=models,
-                default=default
-            )
-            
-            return jsonify(response.dict()), 200
-        
-        providers_data = []
-        available_providers = ai_service.get_available_providers()
-        
-        for provider_name in available_providers:
-            try:
-                provider = ai_service.get_provider(provider_name)
-                try:
-                    models = provider.get_available_models(force_refresh=force_refresh)
-                except TypeError:
-                    models = provider.get_available_models()
-                default = provider.get_default_model()
-                
-                providers_data.append(ProviderModelsResponse(
-                    provider=provider_name,
-                    models=models,
-                    default=default
-                ))
-            except Exception as e:
-                import traceback
-                error_msg = f"Failed to get models for {provider_name}: {str(e)}"
-                print(f"Warning: {error_msg}")
-                print(traceback.format_exc())
-                providers_data.append(ProviderModelsResponse(
-                    provider=provider_name,
-                    models=[],
-                    default=None
-                ))
-        
-        response = AllModelsResponse(providers=providers_data)
-        return jsonify(response.dict()), 200
-    
-    except Exception as e:
-        return jsonify({
-            "error": "Failed to get models",
-            "message": str(e)
-        }), 500
-
+    return _build_models_response(*_models_query_args())
@@ -2,6 +2,7 @@
 Configuration management for AI service
 """
 import os
+from dataclasses import dataclass
 from typing import Optional
 from dotenv import load_dotenv
 
@@ -9,75 +10,123 @@ from dotenv import load_dotenv
 load_dotenv()
 
 
+def _env_bool(name: str, default: str) -> bool:
+    """Read a boolean flag from the environment"""
+    return os.getenv(name, default).lower() in ("true", "1", "yes", "on")
+
+
+@dataclass(frozen=True, slots=True)
 class Config:
-    """Application configuration"""
+    """Application configuration (immutable, read from the environment once)"""
     
     # Security Service Configuration
-    ENABLE_SECURITY_SERVICE: bool = os.getenv(
-        "ENABLE_SECURITY_SERVICE",
-        "true"
-    ).lower() in ("true", "1", "yes", "on")
+    ENABLE_SECURITY_SERVICE: bool
+    SECURITY_SERVICE_URL: str
+    FRONTEND_SECURITY_SERVICE_URL: Optional[str]
+    SECURITY_APPLICATION_ID: str
+    # Maximum pooled keep-alive connections to the security service
+    SECURITY_SERVICE_POOL_SIZE: int
+    # Consecutive connection failures before calls to the security service
+    # are skipped, and for how many seconds
+    SECURITY_SERVICE_BREAKER_FAILURES: int
+    SECURITY_SERVICE_BREAKER_RESET: int
     
-    SECURITY_SERVICE_URL: str = os.getenv(
-        "SECURITY_SERVICE_URL", 
-        "http://localhost:8080"
-    )
-    FRONTEND_SECURITY_SERVICE_URL: Optional[str] = os.getenv("FRONTEND_SECURITY_SERVICE_URL")
-    SECURITY_APPLICATION_ID: str = os.getenv(
-        "SECURITY_APPLICATION_ID",
-        "ai-service"
-    )
+    # Cache for successful API key / token validations (seconds, entries
+    # per credential type); token entries expire sooner
+    AUTH_CACHE_TTL: int
+    AUTH_TOKEN_CACHE_TTL: int
+    AUTH_CACHE_MAX_SIZE: int
+    # Shared secret for the auth cache invalidation webhook (disabled if unset)
+    AUTH_INVALIDATION_SECRET: Optional[str]
     
     # Hardcoded API Key (for standalone mode without security service)
-    HARDCODED_API_KEY: Optional[str] = os.getenv("HARDCODED_API_KEY")
+    HARDCODED_API_KEY: Optional[str]
     
     # Anonymous Access (for testing/development)
     # When enabled, anonymous endpoints are available without authentication
-    ENABLE_ANONYMOUS_ACCESS: bool = os.getenv(
-        "ENABLE_ANONYMOUS_ACCESS",
-        "false"
-    ).lower() in ("true", "1", "yes", "on")
+    ENABLE_ANONYMOUS_ACCESS: bool
     
     # Database Configuration
     # For standalone mode: use external database URL (e.g., MongoDB Atlas, hosted database)
     # For microservices mode: use db-service URL (e.g., mongodb://db-service:27017)
-    DATABASE_URL: Optional[str] = os.getenv("DATABASE_URL")
-    DATABASE_NAME: Optional[str] = os.getenv("DATABASE_NAME", "ai_service_db")
+    DATABASE_URL: Optional[str]
+    DATABASE_NAME: Optional[str]
     
     # AI Provider Configuration
-    OLLAMA_BASE_URL: str = os.getenv(
-        "OLLAMA_BASE_URL",
-        "http://localhost:11434"
-    )
-    GEMINI_API_KEY: Optional[str] = os.getenv("GEMINI_API_KEY")
+    OLLAMA_BASE_URL: str
+    GEMINI_API_KEY: Optional[str]
+    # Seconds a provider's model listing is reused before it is fetched again
+    MODELS_CACHE_TTL: int
+    # Check requested models against the provider's listing before generating.
+    # When disabled, unknown models are rejected by the provider API itself
+    VALIDATE_MODELS: bool
+    # Merge the streamed tokens of each 50 ms write into one SSE chunk frame
+    # (fewer frames for clients to parse; no extra latency, since writes are
+    # buffered for that long either way)
+    COALESCE_STREAMS: bool
+    # Seconds identical non-streaming chat requests reuse a previous answer
+    # (0 disables; only useful when the models are run deterministically)
+    RESPONSE_CACHE_TTL: int
+    RESPONSE_CACHE_MAX_SIZE: int
     
     # Flask Configuration
-    # Render.com uses PORT environment variable, fallback to FLASK_PORT
-    FLASK_PORT: int = int(os.getenv("PORT") or os.getenv("FLASK_PORT", "8081"))
-    FLASK_ENV: str = os.getenv("FLASK_ENV", "production")  # Default to production for security
+    FLASK_PORT: int
+    FLASK_ENV: str
+    LOG_LEVEL: str
     
     # Default Provider
-    DEFAULT_PROVIDER: str = os.getenv("DEFAULT_PROVIDER", "ollama")
+    DEFAULT_PROVIDER: str
     
-    # Validation
     @classmethod
-    def validate(cls) -> None:
+    def load(cls) -> "Config":
+        """Build configuration from environment variables"""
+        return cls(
+            ENABLE_SECURITY_SERVICE=_env_bool("ENABLE_SECURITY_SERVICE", "true"),
+            SECURITY_SERVICE_URL=os.getenv("SECURITY_SERVICE_URL", "http://localhost:8080"),
+            FRONTEND_SECURITY_SERVICE_URL=os.getenv("FRONTEND_SECURITY_SERVICE_URL"),
+            SECURITY_APPLICATION_ID=os.getenv("SECURITY_APPLICATION_ID", "ai-service"),
+            SECURITY_SERVICE_POOL_SIZE=int(os.getenv("SECURITY_SERVICE_POOL_SIZE", "64")),
+            SECURITY_SERVICE_BREAKER_FAILURES=int(os.getenv("SECURITY_SERVICE_BREAKER_FAILURES", "5")),
+            SECURITY_SERVICE_BREAKER_RESET=int(os.getenv("SECURITY_SERVICE_BREAKER_RESET", "30")),
+            AUTH_CACHE_TTL=int(os.getenv("AUTH_CACHE_TTL", "60")),
+            AUTH_TOKEN_CACHE_TTL=int(os.getenv("AUTH_TOKEN_CACHE_TTL", "60")),
+            AUTH_CACHE_MAX_SIZE=int(os.getenv("AUTH_CACHE_MAX_SIZE", "10000")),
+            AUTH_INVALIDATION_SECRET=os.getenv("AUTH_INVALIDATION_SECRET"),
+            HARDCODED_API_KEY=os.getenv("HARDCODED_API_KEY"),
+            ENABLE_ANONYMOUS_ACCESS=_env_bool("ENABLE_ANONYMOUS_ACCESS", "false"),
+            DATABASE_URL=os.getenv("DATABASE_URL"),
+            DATABASE_NAME=os.getenv("DATABASE_NAME", "ai_service_db"),
+            OLLAMA_BASE_URL=os.getenv("OLLAMA_BASE_URL", "http://localhost:11434"),
+            GEMINI_API_KEY=os.getenv("GEMINI_API_KEY"),
+            MODELS_CACHE_TTL=int(os.getenv("MODELS_CACHE_TTL", "300")),
+            VALIDATE_MODELS=_env_bool("VALIDATE_MODELS", "true"),
+            COALESCE_STREAMS=_env_bool("COALESCE_STREAMS", "false"),
+            RESPONSE_CACHE_TTL=int(os.getenv("RESPONSE_CACHE_TTL", "0")),
+            RESPONSE_CACHE_MAX_SIZE=int(os.getenv("RESPONSE_CACHE_MAX_SIZE", "128")),
+            # Render.com uses PORT environment variable, fallback to FLASK_PORT
+            FLASK_PORT=int(os.getenv("PORT") or os.getenv("FLASK_PORT", "8081")),
+            FLASK_ENV=os.getenv("FLASK_ENV", "production"),  # Default to production for security
+            LOG_LEVEL=os.getenv("LOG_LEVEL", "INFO").upper(),
+            DEFAULT_PROVIDER=os.getenv("DEFAULT_PROVIDER", "ollama"),
+        )
+    
+    # Validation
+    def validate(self) -> None:
         """Validate required configuration"""
-        if not cls.GEMINI_API_KEY:
+        if not self.GEMINI_API_KEY:
             print("Warning: GEMINI_API_KEY not set. Gemini provider will not work.")
         
-        if not cls.ENABLE_SECURITY_SERVICE:
-            if not cls.HARDCODED_API_KEY:
+        if not self.ENABLE_SECURITY_SERVICE:
+            if not self.HARDCODED_API_KEY:
                 raise ValueError(
                     "HARDCODED_API_KEY must be set when ENABLE_SECURITY_SERVICE is false. "
                     "Set HARDCODED_API_KEY in your .env file for standalone mode."
                 )
             print("Security service is disabled. Using hardcoded API key for authentication.")
         else:
-            if not cls.SECURITY_APPLICATION_ID:
+            if not self.SECURITY_APPLICATION_ID:
                 raise ValueError("SECURITY_APPLICATION_ID must be set when security service is enabled")
 
 
 # Create global config instance
-config = Config()
-
+config = Config.load()
@@ -0,0 +1,53 @@
+"""
+orjson-backed JSON provider for Flask
+"""
+from typing import Any, Union
+from flask import Response
+from flask.json.provider import DefaultJSONProvider
+import orjson
+
+
+class OrjsonProvider(DefaultJSONProvider):
+    """
+    Flask JSON provider using orjson
+    
+    jsonify() and request.get_json() go through app.json, so every route
+    picks this up without changes. Serialization happens in C and the
+    response body is produced as bytes directly. The sort_keys and
+    compact attributes keep their Flask meaning; ensure_ascii is ignored
+    (orjson always emits UTF-8).
+    
+    Output matches Flask's default provider for what this service sends:
+    non-str dict keys are converted to strings, and dates are passed to
+    Flask's default() so they keep the RFC 822 format. Unlike Flask,
+    integers wider than 64 bits raise TypeError.
+    """
+    
+    def _option(self, sort_keys: bool, indent: bool = False) -> int:
+        """Map Flask's provider settings to orjson option flags"""
+        option = orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME
+        if sort_keys:
+            option |= orjson.OPT_SORT_KEYS
+        if indent:
+            option |= orjson.OPT_INDENT_2
+        return option
+    
+    def dumps(self, obj: Any, **kwargs: Any) -> str:
+        """Serialize data as a JSON string"""
+        option = self._option(kwargs.get("sort_keys", self.sort_keys))
+        return orjson.dumps(obj, default=self.default, option=option).decode()
+    
+    def loads(self, s: Union[str, bytes], **kwargs: Any) -> Any:
+        """Deserialize data from a JSON string or UTF-8 bytes"""
+        return orjson.loads(s)
+    
+    def response(self, *args: Any, **kwargs: Any) -> Response:
+        """Serialize the arguments as JSON and wrap them in a Response"""
+        obj = self._prepare_response_obj(args, kwargs)
+        indent = (self.compact is None and self._app.debug) or self.compact is False
+        body = orjson.dumps(
+            obj,
+            default=self.default,
+            option=self._option(self.sort_keys, indent) | orjson.OPT_APPEND_NEWLINE
+        )
+        return self._app.response_class(body, mimetype=self.mimetype)
@@ -0,0 +1,49 @@
+"""
+Logging setup for AI service
+"""
+from logging.handlers import QueueHandler, QueueListener
+from typing import Optional
+import atexit
+import logging
+import queue
+import sys
+from app.config import config
+
+_LOG_FORMAT = "%(asctime)s %(levelname)s [%(name)s] %(message)s"
+
+_listener: Optional[QueueListener] = None
+
+
+def configure_logging() -> None:
+    """
+    Route all log records through a queue to a background writer thread
+    
+    Request threads only enqueue records; formatting and the blocking write
+    to stdout happen on the listener thread, so a slow log pipe can't stall
+    request handling. Safe to call more than once (e.g. from the gunicorn
+    post_fork hook and at app import); only the first call takes effect.
+    """
+    global _listener
+    if _listener is not None:
+        return
+    
+    stream_handler = logging.StreamHandler(sys.stdout)
+    stream_handler.setFormatter(logging.Formatter(_LOG_FORMAT))
+    
+    log_queue: "queue.SimpleQueue[logging.LogRecord]" = queue.SimpleQueue()
+    queue_handler = QueueHandler(log_queue)
+    # The queue handler only merges args into the message; the listener's
+    # handler applies the real format
+    queue_handler.setFormatter(logging.Formatter("%(message)s"))
+    
+    # force=True replaces handlers installed by earlier basicConfig() calls
+    logging.basicConfig(
+        level=config.LOG_LEVEL,
+        handlers=[queue_handler],
+        force=True
+    )
+    
+    _listener = QueueListener(log_queue, stream_handler, respect_handler_level=True)
+    _listener.start()
+    # Flush queued records on interpreter shutdown
+    atexit.register(_listener.stop)
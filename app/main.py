@@ -1,18 +1,148 @@
 """
 Flask application main entry point
 """
-from flask import Flask, jsonify, send_from_directory
+from flask import Flask, Response, jsonify, request, send_from_directory
 from flask_cors import CORS
 from app.config import config
+from app.logging_config import configure_logging
+from app.json_provider import OrjsonProvider
 from app.api.routes.chat import chat_bp
 from app.api.routes.models import models_bp
-from app.api.routes.health import health_bp
+from app.api.routes.health import health_bp, detailed_health
+from app.api.routes.internal import internal_bp
+from app.api.caching import compute_etag, etag_cached
+from app.services.security_client import get_security_client
+from app.services.http import HTTP
+from concurrent.futures import ThreadPoolExecutor
+import logging
+import orjson
 import os
+import re
+import requests
+
+configure_logging()
+logger = logging.getLogger(__name__)
+
+# Payloads that are fixed for the lifetime of the process
+_STATIC_CACHE_CONTROL = "public, max-age=3600"
+
+# Vite build output is named <name>-<8 char hash>.<ext>
+_HASHED_ASSET_RE = re.compile(r"-[A-Za-z0-9_-]{8}\.[A-Za-z0-9]+$")
+_IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+# Requests under this prefix get JSON errors instead of the SPA shell
+_API_PREFIX = "/api/"
+
+# Constant error bodies, serialized once
+_NOT_FOUND_BODY = orjson.dumps({
+    "error": "Not found",
+    "message": "The requested resource was not found"
+})
+_INTERNAL_ERROR_BODY = orjson.dumps({
+    "error": "Internal server error",
+    "message": "An unexpected error occurred"
+})
+_BAD_REQUEST_BODY = orjson.dumps({
+    "error": "Bad request",
+    "message": "Invalid request data"
+})
+
+# Security service URL as seen from the browser. Frontend runs in browser, needs
+# public URL (localhost), not Docker internal URL: use FRONTEND_SECURITY_SERVICE_URL
+# if set, otherwise map the Docker/Kubernetes internal hostname to localhost
+_PUBLIC_SECURITY_URL = (
+    config.FRONTEND_SECURITY_SERVICE_URL
+    or config.SECURITY_SERVICE_URL.replace("security-service", "localhost")
+)
+
+# Runs the debug_security connectivity probes concurrently; the probes go
+# through the shared HTTP session so connections are reused
+_probe_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="debug-probe")
+
+
+def _probe_health() -> dict:
+    """Check that the security service health endpoint is reachable"""
+    health_url = f"{config.SECURITY_SERVICE_URL}/q/health"
+    try:
+        logger.info("Testing connectivity to: %s", health_url)
+        health_response = HTTP.get(health_url, timeout=5)
+        return {
+            "url": health_url,
+            "status": health_response.status_code,
+            "reachable": True,
+            "response": health_response.text[:200] if health_response.text else None
+        }
+    except requests.exceptions.Timeout as e:
+        return {
+            "url": health_url,
+            "status": "timeout",
+            "reachable": False,
+            "error": f"Timeout: {str(e)}"
+        }
+    except requests.exceptions.ConnectionError as e:
+        return {
+            "url": health_url,
+            "status": "connection_error",
+            "reachable": False,
+            "error": f"Connection error: {str(e)}"
+        }
+    except Exception as e:
+        return {
+            "url": health_url,
+            "status": "error",
+            "reachable": False,
+            "error": str(e)
+        }
+
+
+def _probe_validation(validate_url: str) -> dict:
+    """Check that the security service validation endpoint is reachable"""
+    try:
+        logger.info("Testing validation endpoint: %s", validate_url)
+        # Try a dummy request to see if endpoint is reachable
+        test_response = HTTP.post(
+            validate_url,
+            json={"token": "test", "applicationId": config.SECURITY_APPLICATION_ID, "path": "/", "httpMethod": "GET"},
+            headers={"Content-Type": "application/json"},
+            timeout=5
+        )
+        return {
+            "url": validate_url,
+            "status": test_response.status_code,
+            "reachable": True,
+            "note": "Endpoint is reachable (expected 401 for invalid token)"
+        }
+    except requests.exceptions.Timeout as e:
+        return {
+            "url": validate_url,
+            "status": "timeout",
+            "reachable": False,
+            "error": f"Timeout: {str(e)}"
+        }
+    except requests.exceptions.ConnectionError as e:
+        return {
+            "url": validate_url,
+            "status": "connection_error",
+            "reachable": False,
+            "error": f"Connection error: {str(e)}"
+        }
+    except Exception as e:
+        return {
+            "url": validate_url,
+            "status": "error",
+            "reachable": False,
+            "error": str(e)
+        }
 
 
 def create_app():
     """Create and configure Flask application"""
     app = Flask(__name__, static_folder='static', static_url_path='/static')
+    # Serialize jsonify() responses and parse request bodies with orjson;
+    # payloads are small and machine-read, so skip indenting and key sorting
+    app.json = OrjsonProvider(app)
+    app.json.compact = True
+    app.json.sort_keys = False
     
     # Configure CORS securely
     # In production, restrict to specific origins
@@ -33,183 +163,144 @@ def create_app():
     app.register_blueprint(chat_bp, url_prefix="/api/v1")
     app.register_blueprint(models_bp, url_prefix="/api/v1")
     app.register_blueprint(health_bp)  # Basic health at /health
+    app.register_blueprint(internal_bp)  # Service-to-service hooks at /internal
     
     # Register detailed health at /api/v1/health
-    from app.api.routes.health import detailed_health
     app.add_url_rule("/api/v1/health", "detailed_health", detailed_health, methods=["GET"])
     
     # Serve React app static assets
-    @app.route('/assets/<path:filename>')
     def serve_assets(filename):
-        return send_from_directory(os.path.join(app.static_folder, 'assets'), filename)
+        # send_from_directory hands the open file to the server's
+        # wsgi.file_wrapper, so gunicorn streams it with sendfile()
+        response = send_from_directory(os.path.join(app.static_folder, 'assets'), filename)
+        # Vite fingerprints build output, so a hashed name never changes content
+        if _HASHED_ASSET_RE.search(filename):
+            response.headers['Cache-Control'] = _IMMUTABLE_CACHE_CONTROL
+        return response
+    
+    # The SPA shell is served for every client-side route; read it once
+    # instead of stat-ing and reading it from disk on each hit
+    index_path = os.path.join(app.static_folder, 'index.html')
+    try:
+        with open(index_path, 'rb') as f:
+            index_body = f.read()
+        index_etag = compute_etag(index_body)
+        index_last_modified = os.path.getmtime(index_path)
+    except OSError:
+        # Frontend not built (e.g. local API-only development)
+        index_body = None
+    
+    def index_response():
+        """Serve index.html from memory, answering conditional requests with 304"""
+        if index_body is None:
+            return send_from_directory(app.static_folder, 'index.html')
+        
+        response = Response(index_body, mimetype="text/html")
+        response.set_etag(index_etag)
+        response.last_modified = index_last_modified
+        response.headers['Cache-Control'] = 'no-cache'
+        return response.make_conditional(request)
     
     # Serve React app - SPA routing: all non-API routes serve index.html
-    @app.route('/', defaults={'path': ''})
-    @app.route('/<path:path>')
     def serve_react_app(path):
         # Don't serve index.html for API routes
-        if path.startswith('api/'):
-            return jsonify({"error": "Not found", "message": "The requested resource was not found"}), 404
+        if request.path.startswith(_API_PREFIX):
+            return Response(_NOT_FOUND_BODY, status=404, mimetype="application/json")
         
         # Serve index.html for all other routes (SPA routing)
-        return send_from_directory(app.static_folder, 'index.html')
+        return index_response()
     
     # Error handlers
     @app.errorhandler(404)
     def not_found(error):
         # For API routes, return JSON error
-        from flask import request
-        if request.path.startswith('/api/'):
-            return jsonify({
-                "error": "Not found",
-                "message": "The requested resource was not found"
-            }), 404
+        if request.path.startswith(_API_PREFIX):
+            return Response(_NOT_FOUND_BODY, status=404, mimetype="application/json")
         # For non-API routes, serve React app (SPA routing)
-        return send_from_directory(app.static_folder, 'index.html')
+        return index_response()
     
     @app.errorhandler(500)
     def internal_error(error):
-        return jsonify({
-            "error": "Internal server error",
-            "message": "An unexpected error occurred"
-        }), 500
+        return Response(_INTERNAL_ERROR_BODY, status=500, mimetype="application/json")
     
     @app.errorhandler(400)
     def bad_request(error):
-        return jsonify({
-            "error": "Bad request",
-            "message": "Invalid request data"
-        }), 400
+        return Response(_BAD_REQUEST_BODY, status=400, mimetype="application/json")
+    
+    # API info and frontend config never change after startup, so their
+    # bodies and ETags are built once here instead of on every request
+    api_info_body = orjson.dumps({
+        "service": "ai-service",
+        "version": "1.0.0",
+        "status": "running",
+        "endpoints": {
+            "chat": "/api/v1/chat",
+            "chat_stream": "/api/v1/chat/stream",
+            "models": "/api/v1/models",
+            "health": "/health"
+        }
+    })
+    api_info_etag = compute_etag(api_info_body)
+    
+    config_body = orjson.dumps({
+        "securityServiceUrl": _PUBLIC_SECURITY_URL,
+        "applicationId": config.SECURITY_APPLICATION_ID,
+        "version": "2.2.0"
+    })
+    config_etag = compute_etag(config_body)
     
     # API info endpoint
-    @app.route("/api")
+    @etag_cached(_STATIC_CACHE_CONTROL)
     def api_info():
-        return jsonify({
-            "service": "ai-service",
-            "version": "1.0.0",
-            "status": "running",
-            "endpoints": {
-                "chat": "/api/v1/chat",
-                "chat_stream": "/api/v1/chat/stream",
-                "models": "/api/v1/models",
-                "health": "/health"
-            }
-        })
+        response = Response(api_info_body, mimetype="application/json")
+        response.set_etag(api_info_etag)
+        return response
     
     # Config endpoint for frontend
-    @app.route("/api/config")
+    @etag_cached(_STATIC_CACHE_CONTROL)
     def get_config():
-        # Frontend runs in browser, needs public URL (localhost), not Docker internal URL
-        # Use FRONTEND_SECURITY_SERVICE_URL if set, otherwise convert internal URL to public
-        if config.FRONTEND_SECURITY_SERVICE_URL:
-            security_url = config.FRONTEND_SECURITY_SERVICE_URL
-        else:
-            security_url = config.SECURITY_SERVICE_URL
-            # Convert Docker/Kubernetes internal hostname to localhost for browser access
-            if "security-service" in security_url:
-                # Replace any occurrence of security-service with localhost
-                security_url = security_url.replace("security-service", "localhost")
-        
-        return jsonify({
-            "securityServiceUrl": security_url,
-            "applicationId": config.SECURITY_APPLICATION_ID,
-            "version": "2.2.0"
-        })
+        response = Response(config_body, mimetype="application/json")
+        response.set_etag(config_etag)
+        return response
     
     # Diagnostic endpoint - ONLY available in development mode
-    @app.route("/api/debug/security")
     def debug_security():
-        """Debug endpoint to test security service connectivity - DISABLED in production"""
-        if config.FLASK_ENV == "production":
-            return jsonify({"error": "Not found"}), 404
-        
-        from app.services.security_client import security_client
-        import requests
-        import logging
-        
-        logger = logging.getLogger(__name__)
-        
+        """Debug endpoint to test security service connectivity - not registered in production"""
+        validate_endpoint = get_security_client().validate_endpoint
         debug_info = {
             "security_service_url": config.SECURITY_SERVICE_URL,
             "application_id": config.SECURITY_APPLICATION_ID,
             "connectivity": {},
-            "validation_endpoint": security_client.validate_endpoint
+            "validation_endpoint": validate_endpoint
         }
         
-        # Test basic connectivity to health endpoint
-        try:
-            health_url = f"{config.SECURITY_SERVICE_URL}/q/health"
-            logger.info(f"Testing connectivity to: {health_url}")
-            health_response = requests.get(health_url, timeout=5)
-            debug_info["connectivity"]["health_check"] = {
-                "url": health_url,
-                "status": health_response.status_code,
-                "reachable": True,
-                "response": health_response.text[:200] if health_response.text else None
-            }
-        except requests.exceptions.Timeout as e:
-            debug_info["connectivity"]["health_check"] = {
-                "url": health_url,
-                "status": "timeout",
-                "reachable": False,
-                "error": f"Timeout: {str(e)}"
-            }
-        except requests.exceptions.ConnectionError as e:
-            debug_info["connectivity"]["health_check"] = {
-                "url": health_url,
-                "status": "connection_error",
-                "reachable": False,
-                "error": f"Connection error: {str(e)}"
-            }
-        except Exception as e:
-            debug_info["connectivity"]["health_check"] = {
-                "url": health_url,
-                "status": "error",
-                "reachable": False,
-                "error": str(e)
-            }
-        
-        # Test validation endpoint
-        try:
-            validate_url = security_client.validate_endpoint
-            logger.info(f"Testing validation endpoint: {validate_url}")
-            # Try a dummy request to see if endpoint is reachable
-            test_response = requests.post(
-                validate_url,
-                json={"token": "test", "applicationId": config.SECURITY_APPLICATION_ID, "path": "/", "httpMethod": "GET"},
-                headers={"Content-Type": "application/json"},
-                timeout=5
-            )
-            debug_info["connectivity"]["validation_endpoint"] = {
-                "url": validate_url,
-                "status": test_response.status_code,
-                "reachable": True,
-                "note": "Endpoint is reachable (expected 401 for invalid token)"
-            }
-        except requests.exceptions.Timeout as e:
-            debug_info["connectivity"]["validation_endpoint"] = {
-                "url": validate_url,
-                "status": "timeout",
-                "reachable": False,
-                "error": f"Timeout: {str(e)}"
-            }
-        except requests.exceptions.ConnectionError as e:
-            debug_info["connectivity"]["validation_endpoint"] = {
-                "url": validate_url,
-                "status": "connection_error",
-                "reachable": False,
-                "error": f"Connection error: {str(e)}"
-            }
-        except Exception as e:
-            debug_info["connectivity"]["validation_endpoint"] = {
-                "url": validate_url,
-                "status": "error",
-                "reachable": False,
-                "error": str(e)
-            }
+        # The two probes are independent; run them in parallel so the
+        # response takes as long as the slowest one rather than both
+        health_future = _probe_executor.submit(_probe_health)
+        validation_future = _probe_executor.submit(_probe_validation, validate_endpoint)
+        debug_info["connectivity"]["health_check"] = health_future.result()
+        debug_info["connectivity"]["validation_endpoint"] = validation_future.result()
         
         return jsonify(debug_info)
     
+    # Register routes explicitly, most specific first. The SPA catch-all
+    # goes last so every API and asset rule is tried before it.
+    app.add_url_rule("/api", "api_info", api_info, methods=["GET"])
+    app.add_url_rule("/api/config", "get_config", get_config, methods=["GET"])
+    # Production workers never register the diagnostic route; requests to it
+    # fall through to the catch-all and get the regular JSON 404
+    if config.FLASK_ENV != "production":
+        app.add_url_rule("/api/debug/security", "debug_security", debug_security, methods=["GET"])
+    app.add_url_rule("/assets/<path:filename>", "serve_assets", serve_assets, methods=["GET"])
+    app.add_url_rule(
+        "/", "serve_react_app", serve_react_app,
+        defaults={"path": ""}, methods=["GET"], provide_automatic_options=False
+    )
+    app.add_url_rule(
+        "/<path:path>", "serve_react_app", serve_react_app,
+        methods=["GET"], provide_automatic_options=False
+    )
+    
     return app
 
 
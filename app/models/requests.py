@@ -1,14 +1,21 @@
 """
 Request models for API endpoints
 """
-from typing import Optional, List, Dict, Any
-from pydantic import BaseModel, Field
+from typing import Optional, List, Dict
+from typing_extensions import Annotated, TypedDict
+from pydantic import BaseModel, Field, model_validator
 
 
-class ChatMessage(BaseModel):
-    """Message model for conversation history"""
-    role: str = Field(..., description="Message role: 'user', 'assistant', or 'system'")
-    content: str = Field(..., min_length=1, description="Message content")
+class ChatMessage(TypedDict):
+    """
+    Message model for conversation history
+    
+    A TypedDict rather than a BaseModel: validated messages are already the
+    plain {'role', 'content'} dicts providers expect, so they can be handed
+    over without converting each one. Unknown keys are dropped.
+    """
+    role: Annotated[str, Field(description="Message role: 'user', 'assistant', or 'system'")]
+    content: Annotated[str, Field(min_length=1, description="Message content")]
 
 
 class ChatRequest(BaseModel):
@@ -29,21 +36,22 @@ class ChatRequest(BaseModel):
         if self.messages:
             # Limit context if specified
             max_messages = self.max_context_messages or 20
-            limited_messages = self.messages[-max_messages:] if len(self.messages) > max_messages else self.messages
-            return [{"role": msg.role, "content": msg.content} for msg in limited_messages]
+            # Messages are already provider-shaped dicts; only slice when over the limit
+            if len(self.messages) > max_messages:
+                return self.messages[-max_messages:]
+            return self.messages
         elif self.prompt:
             # Legacy format: convert single prompt to messages
             return [{"role": "user", "content": self.prompt}]
         else:
             raise ValueError("Either 'prompt' or 'messages' must be provided")
     
-    @classmethod
-    def model_validate(cls, obj: Any) -> 'ChatRequest':
-        """Custom validation to ensure either prompt or messages is provided"""
-        instance = super().model_validate(obj)
-        if not instance.prompt and not instance.messages:
+    @model_validator(mode="after")
+    def _require_prompt_or_messages(self) -> 'ChatRequest':
+        """Ensure either prompt or messages is provided"""
+        if not self.prompt and not self.messages:
             raise ValueError("Either 'prompt' or 'messages' must be provided")
-        return instance
+        return self
 
 
 class ModelsRequest(BaseModel):
@@ -1,12 +1,24 @@
 """
 AI Service - Factory and orchestration for AI providers
 """
-from typing import Optional, Dict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional, Dict, List, Sequence, Tuple
+import logging
+import threading
 from app.services.providers.base import AIProvider
 from app.services.providers.ollama_provider import OllamaProvider
 from app.services.providers.gemini_provider import GeminiProvider
 from app.config import config
 
+logger = logging.getLogger(__name__)
+
+# Shared pool for fanning out per-provider calls (model listing is a
+# blocking HTTP round-trip per provider)
+_provider_executor = ThreadPoolExecutor(max_workers=8, thread_name_prefix="ai-provider")
+
+# (provider name, models, default model, error)
+ProviderModels = Tuple[str, Optional[Sequence[str]], Optional[str], Optional[Exception]]
+
 
 class AIService:
     """Main AI service for managing providers"""
@@ -14,34 +26,39 @@ class AIService:
     def __init__(self):
         """Initialize AI service with provider instances"""
         self._providers: Dict[str, AIProvider] = {}
+        # Fixed at runtime; normalized once instead of on every lookup
+        self._default = config.DEFAULT_PROVIDER.lower()
         self._initialize_providers()
+        # Most requests don't name a provider; resolve the default once
+        self._default_provider: Optional[AIProvider] = self._providers.get(self._default)
     
     def _initialize_providers(self):
         """Initialize available providers"""
-        import traceback
-        
         # Initialize Ollama provider
         try:
             self._providers["ollama"] = OllamaProvider()
-            print("[AIService] Ollama provider initialized successfully")
+            logger.info("Ollama provider initialized successfully")
         except Exception as e:
-            print(f"[AIService] Warning: Failed to initialize Ollama provider: {e}")
-            print(traceback.format_exc())
+            # Stack traces are only formatted when debug logging is on
+            logger.warning(
+                "Failed to initialize Ollama provider: %s", e,
+                exc_info=logger.isEnabledFor(logging.DEBUG)
+            )
         
         # Initialize Gemini provider
         try:
             self._providers["gemini"] = GeminiProvider()
-            print("[AIService] Gemini provider initialized successfully")
+            logger.info("Gemini provider initialized successfully")
         except Exception as e:
-            print(f"[AIService] Error: Failed to initialize Gemini provider: {e}")
-            print(f"[AIService] Error type: {type(e).__name__}")
-            print(traceback.format_exc())
+            logger.error(
+                "Failed to initialize Gemini provider: %s (%s)", e, type(e).__name__,
+                exc_info=logger.isEnabledFor(logging.DEBUG)
+            )
             # Check if it's an API key issue
-            from app.config import config
             if not config.GEMINI_API_KEY:
-                print("[AIService] GEMINI_API_KEY is not set in environment")
+                logger.error("GEMINI_API_KEY is not set in environment")
             else:
-                print(f"[AIService] GEMINI_API_KEY is set (length: {len(config.GEMINI_API_KEY)})")
+                logger.info("GEMINI_API_KEY is set (length: %d)", len(config.GEMINI_API_KEY))
     
     def get_provider(self, provider_type: Optional[str] = None) -> AIProvider:
         """
@@ -57,19 +74,25 @@ class AIService:
         Raises:
             ValueError: If provider is not available or not found
         """
-        if provider_type is None:
-            provider_type = config.DEFAULT_PROVIDER
+        if not provider_type and self._default_provider is not None:
+            return self._default_provider
         
-        provider_type = provider_type.lower()
+        provider_type = provider_type or self._default
         
-        if provider_type not in self._providers:
+        # Names are usually already lowercase; only normalize on a miss
+        provider = self._providers.get(provider_type)
+        if provider is None:
+            provider_type = provider_type.lower()
+            provider = self._providers.get(provider_type)
+        
+        if provider is None:
             available = list(self._providers.keys())
             raise ValueError(
                 f"Provider '{provider_type}' is not available. "
                 f"Available providers: {available}"
             )
         
-        return self._providers[provider_type]
+        return provider
     
     def get_available_providers(self) -> list[str]:
         """
@@ -90,9 +113,66 @@ class AIService:
         Returns:
             True if provider is available, False otherwise
         """
-        return provider_type.lower() in self._providers
+        return provider_type in self._providers or provider_type.lower() in self._providers
+    
+    def fetch_provider_models(
+        self,
+        force_refresh: bool = False,
+        provider_names: Optional[List[str]] = None
+    ) -> List[ProviderModels]:
+        """
+        Fetch models and default model from providers in parallel
+        
+        Args:
+            force_refresh: Force providers to bypass their model caches
+            provider_names: Providers to query (defaults to all available)
+        
+        Returns:
+            List of (name, models, default, error) tuples in provider order.
+            On failure models and default are None and error is set.
+        """
+        if provider_names is None:
+            provider_names = self.get_available_providers()
+        
+        futures = [
+            _provider_executor.submit(self._fetch_provider_models, name, force_refresh)
+            for name in provider_names
+        ]
+        return [future.result() for future in futures]
+    
+    def _fetch_provider_models(self, provider_name: str, force_refresh: bool) -> ProviderModels:
+        """Fetch models and default model for a single provider"""
+        try:
+            provider = self._providers[provider_name]
+            # Use force_refresh if supported (both Ollama and Gemini support it)
+            try:
+                models = provider.get_available_models(force_refresh=force_refresh)
+            except TypeError:
+                # Fallback for providers that don't support force_refresh parameter
+                models = provider.get_available_models()
+            return provider_name, models, provider.get_default_model(), None
+        except Exception as e:
+            return provider_name, None, None, e
+
 
+# Created on first use rather than at import time, so provider clients are
+# built inside each worker process (after gunicorn forks) instead of in the
+# master, and importing this module stays cheap
+_ai_service: Optional[AIService] = None
+_ai_service_lock = threading.Lock()
 
-# Global instance
-ai_service = AIService()
+
+def get_ai_service() -> AIService:
+    """
+    Get the process-wide AIService, creating it on first call
+    
+    Returns:
+        Shared AIService instance
+    """
+    global _ai_service
+    if _ai_service is None:
+        with _ai_service_lock:
+            if _ai_service is None:
+                _ai_service = AIService()
+    return _ai_service
 
@@ -0,0 +1,84 @@
+"""
+Circuit breaker for calls to downstream services
+"""
+import threading
+import time
+from typing import Any, Callable, Tuple, Type
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling the service while the circuit is open"""
+    pass
+
+
+class CircuitBreaker:
+    """
+    Fail fast while a downstream service keeps failing
+    
+    After `fail_max` consecutive failures the circuit opens and calls are
+    rejected immediately with CircuitOpenError for `reset_timeout` seconds,
+    instead of each one waiting for its own timeout. The first call after
+    that is let through as a trial (half-open): success closes the
+    circuit, failure opens it for another `reset_timeout`.
+    
+    Only exceptions of `failure_types` count as failures; anything else
+    (e.g. a rejected credential) propagates without affecting the state.
+    Safe to share between threads.
+    """
+    
+    def __init__(
+        self,
+        fail_max: int = 5,
+        reset_timeout: float = 30,
+        failure_types: Tuple[Type[BaseException], ...] = (Exception,)
+    ):
+        """
+        Initialize the breaker
+        
+        Args:
+            fail_max: Consecutive failures that open the circuit
+            reset_timeout: Seconds the circuit stays open before a trial call
+            failure_types: Exception types that count as failures
+        """
+        self.fail_max = fail_max
+        self.reset_timeout = reset_timeout
+        self.failure_types = failure_types
+        self._failures = 0
+        # time.monotonic() until which calls are rejected; 0 when closed
+        self._open_until = 0.0
+        self._trial_in_progress = False
+        self._lock = threading.Lock()
+    
+    def call(self, func: Callable[..., Any], *args: Any, **kwargs: Any) -> Any:
+        """
+        Call func unless the circuit is open
+        
+        Raises:
+            CircuitOpenError: If the circuit is open
+        """
+        with self._lock:
+            if self._failures >= self.fail_max:
+                if self._trial_in_progress or time.monotonic() < self._open_until:
+                    raise CircuitOpenError("Circuit open: service marked unavailable")
+                # Cooldown over; let this call through as the trial
+                self._trial_in_progress = True
+        
+        try:
+            result = func(*args, **kwargs)
+        except self.failure_types:
+            with self._lock:
+                self._trial_in_progress = False
+                self._failures += 1
+                if self._failures >= self.fail_max:
+                    self._open_until = time.monotonic() + self.reset_timeout
+            raise
+        except BaseException:
+            with self._lock:
+                self._trial_in_progress = False
+            raise
+        
+        with self._lock:
+            self._trial_in_progress = False
+            self._failures = 0
+            self._open_until = 0.0
+        return result
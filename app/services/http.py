@@ -0,0 +1,47 @@
+"""
+Shared HTTP client sessions
+"""
+from typing import Dict, Optional, Union
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+
+def create_session(
+    pool_connections: int = 20,
+    pool_maxsize: int = 100,
+    max_retries: Union[int, Retry] = 0,
+    headers: Optional[Dict[str, str]] = None
+) -> requests.Session:
+    """
+    Create a requests session with a keep-alive connection pool
+    
+    Reusing a session avoids a new TCP (and TLS) handshake per call.
+    
+    Args:
+        pool_connections: Number of per-host pools to keep
+        pool_maxsize: Maximum connections kept per host
+        max_retries: Retry policy; no retries by default, so a slow or
+            failing upstream isn't called again behind the caller's back.
+            Callers that can safely retry pass their own Retry.
+        headers: Default headers added to every request
+    
+    Returns:
+        Configured requests session
+    """
+    adapter = HTTPAdapter(
+        pool_connections=pool_connections,
+        pool_maxsize=pool_maxsize,
+        max_retries=max_retries
+    )
+    session = requests.Session()
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    if headers:
+        session.headers.update(headers)
+    return session
+
+
+# Process-wide session for outbound calls that don't need their own pool
+# (e.g. diagnostic probes)
+HTTP = create_session()
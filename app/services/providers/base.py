@@ -2,12 +2,59 @@
 Abstract base class for AI providers
 """
 from abc import ABC, abstractmethod
-from typing import List, Generator, Optional, Dict, Any
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import List, Generator, Optional, Dict, Any, FrozenSet, Sequence, Tuple
+import hashlib
+import logging
+import os
+import threading
+import time
+import orjson
+from app.config import config
+from app.services.shared_files import private_cache_dir
+
+try:
+    import fcntl
+except ImportError:  # Not available on Windows
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True, slots=True)
+class ModelList:
+    """
+    A provider's model list as fetched at one point in time
+    
+    Everything derived from one fetch lives in one object, which is
+    replaced as a whole, so readers can't mix the names of one fetch with
+    the lookup set of another.
+    """
+    # time.monotonic() of the fetch
+    fetched_at: float
+    models: Tuple[str, ...]
+    # The same names as a set, for validate_model()
+    names: FrozenSet[str] = field(init=False)
+    
+    def __post_init__(self):
+        object.__setattr__(self, "names", frozenset(self.models))
 
 
 class AIProvider(ABC):
     """Abstract base class for AI providers"""
     
+    # Seconds a fetched model list is served before the provider is queried again
+    CACHE_TTL = config.MODELS_CACHE_TTL
+    # A read this close to expiry refreshes the list in the background, so
+    # steady traffic never waits on a refresh
+    CACHE_REFRESH_AHEAD = 5
+    # Seconds after a failed refresh during which callers get the stale
+    # list (or None) instead of fetching again, so a down provider costs
+    # one timeout rather than one per waiting request
+    CACHE_RETRY_AFTER = 5
+    
     def __init__(self, name: str):
         """
         Initialize the provider
@@ -16,6 +63,209 @@ class AIProvider(ABC):
             name: Provider name (e.g., 'ollama', 'gemini')
         """
         self.name = name
+        # Last successful model list; providers may seed it in __init__
+        self._cache: Optional[ModelList] = None
+        # Serializes model-list refreshes so concurrent cache misses
+        # trigger a single fetch
+        self._models_lock = threading.Lock()
+        # time.monotonic() of the last refresh that returned None
+        self._refresh_failed_at = float("-inf")
+        # LRU of key -> (response text, expires_at) for generate_response();
+        # disabled unless RESPONSE_CACHE_TTL is set
+        self._response_cache: "OrderedDict[bytes, Tuple[str, float]]" = OrderedDict()
+        self._response_cache_lock = threading.Lock()
+    
+    def _models_cache_scope(self) -> str:
+        """
+        What this provider's model list depends on (server URL, credential)
+        
+        Part of the snapshot file name, so differently configured providers
+        never read each other's list. Hashed before use; may be secret.
+        """
+        return ""
+    
+    @property
+    def _models_cache_file(self) -> Optional[Path]:
+        """Location of the model list shared by all worker processes, if one is usable"""
+        directory = private_cache_dir()
+        if directory is None:
+            return None
+        scope = hashlib.blake2b(self._models_cache_scope().encode(), digest_size=16).hexdigest()
+        return directory / f"{self.name}-models-{scope}.json"
+    
+    def _load_models_snapshot(self, max_age: float) -> Optional[ModelList]:
+        """
+        Load a model list another process saved with _save_models_snapshot()
+        
+        Args:
+            max_age: Seconds after which a saved list is ignored
+        
+        Returns:
+            The saved list (dated on the time.monotonic() clock), or None
+            if there is no usable snapshot
+        """
+        path = self._models_cache_file
+        if path is None:
+            return None
+        try:
+            data = orjson.loads(path.read_bytes())
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            logger.debug("Ignoring unreadable %s model cache: %s", self.name, e)
+            return None
+        
+        saved_at = data.get("ts") if isinstance(data, dict) else None
+        models = data.get("models") if isinstance(data, dict) else None
+        if (
+            not isinstance(saved_at, (int, float))
+            or not isinstance(models, list)
+            or not all(isinstance(model, str) for model in models)
+        ):
+            logger.debug("Ignoring malformed %s model cache", self.name)
+            return None
+        
+        age = time.time() - saved_at
+        if not models or not 0 <= age < max_age:
+            return None
+        return self._new_model_list(time.monotonic() - age, tuple(models))
+    
+    def _save_models_snapshot(self, models: Tuple[str, ...]) -> None:
+        """
+        Save a freshly fetched model list for other (and future) processes
+        
+        The file is replaced atomically, and an exclusive lock keeps
+        workers that refresh at the same time from clobbering each other's
+        temporary file. Files are only readable by this user. Failures are
+        logged and otherwise ignored; the disk copy is only an optimization.
+        
+        Args:
+            models: Model names as cached in memory
+        """
+        path = self._models_cache_file
+        if path is None:
+            return
+        body = orjson.dumps({"ts": time.time(), "models": models})
+        try:
+            lock_fd = os.open(path.with_suffix(".lock"), os.O_WRONLY | os.O_CREAT, 0o600)
+            with open(lock_fd, "w") as lock_file:
+                if fcntl is not None:
+                    fcntl.flock(lock_file, fcntl.LOCK_EX)
+                tmp_path = path.with_suffix(".tmp")
+                tmp_fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+                with open(tmp_fd, "wb") as tmp_file:
+                    tmp_file.write(body)
+                os.replace(tmp_path, path)
+        except OSError as e:
+            logger.debug("Could not save %s model cache: %s", self.name, e)
+    
+    def _new_model_list(self, fetched_at: float, models: Tuple[str, ...]) -> ModelList:
+        """Build the cache object for a freshly fetched (or loaded) model list"""
+        return ModelList(fetched_at, models)
+    
+    def _model_list(self, force_refresh: bool = False) -> Optional[ModelList]:
+        """
+        Get the cached model list, refreshing it when it is stale
+        
+        Args:
+            force_refresh: If True, clear the cache and fetch fresh data
+        
+        Returns:
+            The current model list; the stale one if a refresh failed
+            within CACHE_RETRY_AFTER, or None if there is none
+        """
+        if force_refresh:
+            self.clear_cache()
+        
+        # Read the cache once; another thread may replace it concurrently
+        cached = self._cache
+        if cached is not None:
+            age = time.monotonic() - cached.fetched_at
+            if age < self.CACHE_TTL:
+                if age >= self.CACHE_TTL - self.CACHE_REFRESH_AHEAD:
+                    self._refresh_in_background()
+                logger.debug("Returning %d cached %s models", len(cached.models), self.name)
+                return cached
+        
+        if not force_refresh and self._refresh_recently_failed():
+            return cached
+        
+        with self._models_lock:
+            # Another thread may have refreshed the list (or failed to)
+            # while we waited
+            cached = self._cache
+            if cached is not None and time.monotonic() - cached.fetched_at < self.CACHE_TTL:
+                return cached
+            if not force_refresh and self._refresh_recently_failed():
+                return cached
+            return self._refresh_or_keep(cached)
+    
+    def _refresh_recently_failed(self) -> bool:
+        """Whether the last refresh failed less than CACHE_RETRY_AFTER seconds ago"""
+        return time.monotonic() - self._refresh_failed_at < self.CACHE_RETRY_AFTER
+    
+    def _refresh_or_keep(self, stale: Optional[ModelList]) -> Optional[ModelList]:
+        """
+        Refresh the model list, recording a failure so concurrent and
+        following callers don't repeat it
+        
+        Callers must hold self._models_lock.
+        
+        Returns:
+            The new model list, or the stale one if the refresh failed
+        """
+        refreshed = self._refresh_models()
+        if refreshed is None:
+            self._refresh_failed_at = time.monotonic()
+            return stale
+        return refreshed
+    
+    def _refresh_in_background(self) -> None:
+        """Refresh the model list on a background thread unless a refresh is already running"""
+        if not self._models_lock.acquire(blocking=False):
+            return
+        
+        def refresh() -> None:
+            try:
+                self._refresh_or_keep(None)
+            finally:
+                self._models_lock.release()
+        
+        try:
+            threading.Thread(target=refresh, name=f"{self.name}-models-refresh", daemon=True).start()
+        except BaseException:
+            self._models_lock.release()
+            raise
+    
+    @abstractmethod
+    def _refresh_models(self) -> Optional[ModelList]:
+        """
+        Fetch the model list from the provider and store it in self._cache
+        
+        Called by _model_list() with self._models_lock held.
+        
+        Returns:
+            The new model list, or None if it couldn't be fetched
+        """
+        pass
+    
+    def clear_cache(self) -> None:
+        """Clear the cached models to force a fresh fetch"""
+        self._cache = None
+    
+    def warm_models_cache(self) -> None:
+        """
+        Fetch the model list on a background thread
+        
+        Called once the provider is set up so the first chat request
+        doesn't wait on model discovery. Failures are handled (and logged)
+        by get_available_models() itself.
+        """
+        threading.Thread(
+            target=self.get_available_models,
+            name=f"{self.name}-models-warmup",
+            daemon=True
+        ).start()
     
     def generate_response(
         self, 
@@ -42,7 +292,60 @@ class AIProvider(ABC):
             if prompt is None:
                 raise ValueError("Either 'prompt' or 'messages' must be provided")
             messages = [{"role": "user", "content": prompt}]
-        return self.generate_response_with_messages(messages, model)
+        
+        if config.RESPONSE_CACHE_TTL <= 0:
+            return self.generate_response_with_messages(messages, model)
+        
+        # Resolve the default once, so the answer is cached under the model
+        # that actually produced it
+        selected_model = model or self.get_default_model()
+        
+        # Identical (model, conversation) requests within the TTL get the
+        # same answer without another model call
+        key = hashlib.blake2b(
+            orjson.dumps([selected_model, messages]),
+            digest_size=16
+        ).digest()
+        response = self._get_cached_response(key)
+        if response is None:
+            response = self.generate_response_with_messages(messages, selected_model)
+            self._cache_response(key, response)
+        return response
+    
+    def _get_cached_response(self, key: bytes) -> Optional[str]:
+        """
+        Look up a memoized response
+        
+        Args:
+            key: Digest of the model and conversation
+        
+        Returns:
+            Cached response text, or None if missing or expired
+        """
+        with self._response_cache_lock:
+            entry = self._response_cache.get(key)
+            if entry is None:
+                return None
+            if time.monotonic() >= entry[1]:
+                del self._response_cache[key]
+                return None
+            self._response_cache.move_to_end(key)
+            return entry[0]
+    
+    def _cache_response(self, key: bytes, response: str) -> None:
+        """
+        Memoize a response, evicting the least recently used entries
+        
+        Args:
+            key: Digest of the model and conversation
+            response: Generated response text
+        """
+        expires_at = time.monotonic() + config.RESPONSE_CACHE_TTL
+        with self._response_cache_lock:
+            self._response_cache[key] = (response, expires_at)
+            self._response_cache.move_to_end(key)
+            while len(self._response_cache) > config.RESPONSE_CACHE_MAX_SIZE:
+                self._response_cache.popitem(last=False)
     
     @abstractmethod
     def generate_response_with_messages(
@@ -114,12 +417,13 @@ class AIProvider(ABC):
         pass
     
     @abstractmethod
-    def get_available_models(self) -> List[str]:
+    def get_available_models(self) -> Sequence[str]:
         """
         Get list of available models for this provider
         
         Returns:
-            List of model names/identifiers
+            Model names/identifiers. Implementations may return a shared,
+            cached sequence; callers must not mutate it.
         """
         pass
     
@@ -143,6 +447,7 @@ class AIProvider(ABC):
         Returns:
             True if model is available, False otherwise
         """
-        available_models = self.get_available_models()
-        return model in available_models if available_models else False
+        # The set is built with the list it came from, once per fetch
+        cached = self._model_list()
+        return cached is not None and model in cached.names
 
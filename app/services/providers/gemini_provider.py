@@ -1,8 +1,11 @@
 """
 Google Gemini AI provider implementation
 """
-from typing import List, Optional, Generator, Dict
-from app.services.providers.base import AIProvider
+from functools import lru_cache
+from typing import List, Optional, Generator, Dict, Tuple
+import logging
+import time
+from app.services.providers.base import AIProvider, ModelList
 from app.config import config
 
 try:
@@ -14,6 +17,8 @@ except ImportError:
     genai = None
     types = None
 
+logger = logging.getLogger(__name__)
+
 
 class GeminiProvider(AIProvider):
     """Google Gemini provider implementation"""
@@ -21,7 +26,7 @@ class GeminiProvider(AIProvider):
     # Comprehensive list of Gemini models sorted by price (cheapest first)
     # Pricing reference: https://ai.google.dev/pricing
     # Order: Flash-Lite (cheapest) -> Flash -> Pro (most expensive)
-    GEMINI_MODELS_BY_PRICE = [
+    GEMINI_MODELS_BY_PRICE = (
         "gemini-2.0-flash-lite",      # Cheapest: $0.10/$0.40 per M tokens
         "gemini-2.0-flash-exp",       # Experimental flash
         "gemini-2.0-flash",           # Fast and efficient: ~$0.15/$0.50
@@ -31,7 +36,9 @@ class GeminiProvider(AIProvider):
         "gemini-1.5-pro-latest",      # Latest pro variant
         "gemini-pro",                 # Original pro
         "gemini-pro-vision"           # Vision-capable pro
-    ]
+    )
+    # Model -> price order (lower index = cheaper)
+    _PRICE_ORDER = {model: idx for idx, model in enumerate(GEMINI_MODELS_BY_PRICE)}
     
     def __init__(self, api_key: Optional[str] = None):
         """
@@ -52,12 +59,20 @@ class GeminiProvider(AIProvider):
         
         # Initialize Gemini client
         self.client = genai.Client(api_key=self.api_key)
+        # Model listing support depends on the SDK version; check it once
+        self._supports_list_models = hasattr(getattr(self.client, 'models', None), 'list')
         self.default_model = "gemini-2.0-flash"
-        self._cached_models: Optional[List[str]] = None
+        # Start from the list another worker saved, if it is still fresh
+        self._cache = self._load_models_snapshot(self.CACHE_TTL)
         
-        print(f"[GeminiProvider] Initialized with API key: {'***' + self.api_key[-4:] if len(self.api_key) > 4 else '***'}")
+        logger.debug("Gemini provider initialized")
+        self.warm_models_cache()
+    
+    def _models_cache_scope(self) -> str:
+        """Listed models depend on the API key's project"""
+        return self.api_key
     
-    def get_available_models(self, force_refresh: bool = False) -> List[str]:
+    def get_available_models(self, force_refresh: bool = False) -> Tuple[str, ...]:
         """
         Get available Gemini models, trying to fetch from API first,
         falling back to hardcoded list sorted by price
@@ -66,21 +81,22 @@ class GeminiProvider(AIProvider):
             force_refresh: If True, clear cache and fetch fresh data
         
         Returns:
-            List of available model names (sorted by price, cheapest first)
+            Available model names (sorted by price, cheapest first). The
+            tuple is shared with the cache, so callers never need to copy it.
         """
-        print(f"[GeminiProvider.get_available_models] Called with force_refresh={force_refresh}")
-        
-        # Clear cache if force refresh is requested
-        if force_refresh:
-            print(f"[GeminiProvider.get_available_models] Clearing cache due to force_refresh")
-            self._cached_models = None
+        return self._model_list(force_refresh).models
+    
+    def _refresh_models(self) -> ModelList:
+        """
+        Fetch the model list (or fall back to the hardcoded one) and store
+        it in the cache
         
-        # Return cached models if available
-        if self._cached_models is not None:
-            print(f"[GeminiProvider.get_available_models] Returning {len(self._cached_models)} cached models")
-            return self._cached_models.copy()
+        Callers must hold self._models_lock.
         
-        print(f"[GeminiProvider.get_available_models] Attempting to fetch models from Gemini API...")
+        Returns:
+            The new model list, sorted by price (cheapest first)
+        """
+        now = time.monotonic()
         
         # Try to fetch models dynamically from API
         try:
@@ -88,19 +104,21 @@ class GeminiProvider(AIProvider):
             # If not available, we'll fall back to the hardcoded list
             models = self._fetch_models_from_api()
             if models:
-                print(f"[GeminiProvider.get_available_models] Successfully fetched {len(models)} models from API")
+                logger.debug("Fetched %d models from Gemini API", len(models))
                 # Sort by price (using our price-ordered list as reference)
-                models = self._sort_models_by_price(models)
-                self._cached_models = models
-                return models.copy()
+                models = tuple(self._sort_models_by_price(models))
+                cached = self._new_model_list(now, models)
+                self._cache = cached
+                self._save_models_snapshot(models)
+                return cached
         except Exception as e:
-            print(f"[GeminiProvider.get_available_models] Failed to fetch from API: {str(e)}")
-            print(f"[GeminiProvider.get_available_models] Falling back to hardcoded list")
+            logger.warning("Failed to fetch Gemini models, falling back to hardcoded list: %s", e)
         
         # Fallback to hardcoded list sorted by price
-        print(f"[GeminiProvider.get_available_models] Using hardcoded list of {len(self.GEMINI_MODELS_BY_PRICE)} models")
-        self._cached_models = self.GEMINI_MODELS_BY_PRICE.copy()
-        return self._cached_models.copy()
+        logger.debug("Using hardcoded list of %d Gemini models", len(self.GEMINI_MODELS_BY_PRICE))
+        cached = self._new_model_list(now, self.GEMINI_MODELS_BY_PRICE)
+        self._cache = cached
+        return cached
     
     def _fetch_models_from_api(self) -> List[str]:
         """
@@ -112,8 +130,7 @@ class GeminiProvider(AIProvider):
         try:
             # Try to list models using the client
             # Note: The exact API may vary, this is a best-effort attempt
-            if hasattr(self.client, 'models') and hasattr(self.client.models, 'list'):
-                print(f"[GeminiProvider._fetch_models_from_api] Attempting to list models via client.models.list()")
+            if self._supports_list_models:
                 models_list = self.client.models.list()
                 models = []
                 for model in models_list:
@@ -123,13 +140,12 @@ class GeminiProvider(AIProvider):
                         if '/' in model_name:
                             model_name = model_name.split('/')[-1]
                         models.append(model_name)
-                        print(f"[GeminiProvider._fetch_models_from_api] Found model: {model_name}")
                 return models
             else:
-                print(f"[GeminiProvider._fetch_models_from_api] Client doesn't support model listing")
+                logger.debug("Gemini client doesn't support model listing")
                 return []
         except Exception as e:
-            print(f"[GeminiProvider._fetch_models_from_api] Error fetching models: {str(e)}")
+            logger.warning("Error fetching Gemini models: %s", e)
             return []
     
     def _sort_models_by_price(self, models: List[str]) -> List[str]:
@@ -142,23 +158,7 @@ class GeminiProvider(AIProvider):
         Returns:
             Sorted list (cheapest first)
         """
-        # Create a mapping of model to price order (lower index = cheaper)
-        price_order = {model: idx for idx, model in enumerate(self.GEMINI_MODELS_BY_PRICE)}
-        
-        def get_price_order(model_name: str) -> int:
-            # Check for exact match first
-            if model_name in price_order:
-                return price_order[model_name]
-            # Check for partial matches (e.g., "gemini-2.0-flash-latest" matches "gemini-2.0-flash")
-            for ordered_model in self.GEMINI_MODELS_BY_PRICE:
-                if ordered_model in model_name or model_name in ordered_model:
-                    return price_order[ordered_model]
-            # Unknown models go to the end
-            return 9999
-        
-        sorted_models = sorted(models, key=get_price_order)
-        print(f"[GeminiProvider._sort_models_by_price] Sorted {len(sorted_models)} models by price")
-        return sorted_models
+        return sorted(models, key=_price_rank)
     
     def get_default_model(self) -> str:
         """
@@ -189,29 +189,15 @@ class GeminiProvider(AIProvider):
         """
         selected_model = model or self.get_default_model()
         
-        # Validate model - get current available models
-        available_models = self.get_available_models()
-        if selected_model not in available_models:
-            raise ValueError(f"Model {selected_model} is not available. Available models: {available_models}")
+        # Validate model against a hashed snapshot of the model list; the
+        # listing itself is only read to build the error message
+        if config.VALIDATE_MODELS and not self.validate_model(selected_model):
+            raise ValueError(f"Model {selected_model} is not available. Available models: {self.get_available_models()}")
         
         try:
-            # Convert messages to Gemini format
-            # Gemini expects contents as a list of parts with role
-            contents = []
-            for msg in messages:
-                role = msg.get("role", "user")
-                content = msg.get("content", "")
-                # Gemini uses 'user' and 'model' roles (not 'assistant')
-                if role == "assistant":
-                    role = "model"
-                contents.append({
-                    "role": role,
-                    "parts": [{"text": content}]
-                })
-            
             response = self.client.models.generate_content(
                 model=selected_model,
-                contents=contents
+                contents=_to_gemini_contents(messages)
             )
             
             return response.text if hasattr(response, 'text') else str(response)
@@ -239,29 +225,15 @@ class GeminiProvider(AIProvider):
         """
         selected_model = model or self.get_default_model()
         
-        # Validate model - get current available models
-        available_models = self.get_available_models()
-        if selected_model not in available_models:
-            raise ValueError(f"Model {selected_model} is not available. Available models: {available_models}")
+        # Validate model against a hashed snapshot of the model list; the
+        # listing itself is only read to build the error message
+        if config.VALIDATE_MODELS and not self.validate_model(selected_model):
+            raise ValueError(f"Model {selected_model} is not available. Available models: {self.get_available_models()}")
         
         try:
-            # Convert messages to Gemini format
-            # Gemini expects contents as a list of parts with role
-            contents = []
-            for msg in messages:
-                role = msg.get("role", "user")
-                content = msg.get("content", "")
-                # Gemini uses 'user' and 'model' roles (not 'assistant')
-                if role == "assistant":
-                    role = "model"
-                contents.append({
-                    "role": role,
-                    "parts": [{"text": content}]
-                })
-            
             stream_iter = self.client.models.generate_content_stream(
                 model=selected_model,
-                contents=contents
+                contents=_to_gemini_contents(messages)
             )
             
             for chunk in stream_iter:
@@ -273,3 +245,50 @@ class GeminiProvider(AIProvider):
         except Exception as e:
             raise Exception(f"Gemini API stream error: {str(e)}")
 
+
+# API-returned model names are a small, bounded set, so the partial-match
+# scan below runs at most once per distinct name
+@lru_cache(maxsize=256)
+def _price_rank(model_name: str) -> int:
+    """
+    Get the price order of a model (lower = cheaper)
+    
+    Args:
+        model_name: Model name as returned by the API
+    
+    Returns:
+        Index in GEMINI_MODELS_BY_PRICE, or 9999 for unknown models
+    """
+    # Check for exact match first
+    rank = GeminiProvider._PRICE_ORDER.get(model_name)
+    if rank is not None:
+        return rank
+    # Check for partial matches (e.g., "gemini-2.0-flash-latest" matches "gemini-2.0-flash")
+    for idx, ordered_model in enumerate(GeminiProvider.GEMINI_MODELS_BY_PRICE):
+        if ordered_model in model_name or model_name in ordered_model:
+            return idx
+    # Unknown models go to the end
+    return 9999
+
+
+def _to_gemini_contents(messages: List[Dict[str, str]]) -> List[Dict]:
+    """
+    Convert conversation history to Gemini's contents format
+    
+    Gemini expects a list of {role, parts: [{text}]} entries and uses the
+    'model' role where the API uses 'assistant'.
+    
+    Args:
+        messages: Validated conversation history (every entry has 'role'
+            and 'content')
+    
+    Returns:
+        Contents list for generate_content / generate_content_stream
+    """
+    return [
+        {
+            "role": "model" if msg["role"] == "assistant" else msg["role"],
+            "parts": [{"text": msg["content"]}]
+        }
+        for msg in messages
+    ]
@@ -2,11 +2,33 @@
 Ollama AI provider implementation
 """
 import requests
-import json
+from dataclasses import dataclass
+from functools import lru_cache
+from itertools import islice
+import logging
 import re
-from typing import List, Optional, Generator, Dict
-from app.services.providers.base import AIProvider
+import time
+from typing import List, Optional, Generator, Dict, Tuple
+import orjson
+from app.services.providers.base import AIProvider, ModelList
 from app.config import config
+from app.services.http import create_session
+
+logger = logging.getLogger(__name__)
+
+# Parameter count in a model name, e.g. llama3.2:1b -> 1, mistral-7b -> 7
+_TAG_SIZE_RE = re.compile(r':(\d+)b')
+_SIZE_RE = re.compile(r'(\d+)b')
+
+# Substrings of Ollama error messages that indicate the model didn't fit in
+# memory ("out of memory" is covered by "memory")
+_MEM_KEYWORDS = ("memory", "buffer", "allocate", "cuda")
+
+
+@dataclass(frozen=True, slots=True)
+class _OllamaModelList(ModelList):
+    """Ollama model list, also ordered by (estimated size, name) for get_default_model()"""
+    by_size: Tuple[str, ...]
 
 
 class OllamaProvider(AIProvider):
@@ -24,61 +46,67 @@ class OllamaProvider(AIProvider):
         self.generate_endpoint = f"{self.base_url}/api/generate"
         self.chat_endpoint = f"{self.base_url}/api/chat"
         self.tags_endpoint = f"{self.base_url}/api/tags"
-        self._cached_models: Optional[List[str]] = None
+        # Dedicated keep-alive pool for the (usually local) Ollama server;
+        # every call sends JSON, so the content type is a session default
+        self._session = create_session(
+            pool_connections=4,
+            pool_maxsize=10,
+            headers={"Content-Type": "application/json"}
+        )
+        # Models and their metadata are refreshed together. Start from the
+        # list another worker saved, if it is still fresh
+        self._cache = self._load_models_snapshot(self.CACHE_TTL)
         self._model_metadata: Dict[str, Dict] = {}  # Store model metadata (size, etc.)
         
-        print(f"[OllamaProvider] Initialized with base_url: {self.base_url}")
-        print(f"[OllamaProvider] Tags endpoint: {self.tags_endpoint}")
-        print(f"[OllamaProvider] Generate endpoint: {self.generate_endpoint}")
-        print(f"[OllamaProvider] Chat endpoint: {self.chat_endpoint}")
+        logger.debug("Ollama provider initialized with base_url: %s", self.base_url)
+        self.warm_models_cache()
+    
+    def _models_cache_scope(self) -> str:
+        """The model list belongs to one Ollama server"""
+        return self.base_url
     
-    def clear_cache(self):
+    def clear_cache(self) -> None:
         """Clear the cached models to force a fresh fetch"""
-        self._cached_models = None
+        super().clear_cache()
         self._model_metadata = {}
     
-    def _estimate_model_size(self, model_name: str) -> int:
+    def _new_model_list(self, fetched_at: float, models: Tuple[str, ...]) -> _OllamaModelList:
+        """Build the cache object, ordering the models by size once per fetch"""
+        return _OllamaModelList(fetched_at, models, self._sort_by_size(models))
+    
+    @classmethod
+    def _sort_by_size(cls, models: Tuple[str, ...]) -> Tuple[str, ...]:
+        """Order models smallest first, by name among equal sizes"""
+        return tuple(sorted(models, key=lambda m: (cls._estimate_model_size(m), m)))
+    
+    @staticmethod
+    @lru_cache(maxsize=512)
+    def _estimate_model_size(model_name: str) -> int:
         """
         Estimate model size from name to help prioritize smaller models.
         Returns estimated parameter count in billions (e.g., 1 for 1b, 7 for 7b, 70 for 70b).
         Lower number = smaller model = preferred for default.
+        Memoized per name; model names are a small, fixed set.
         """
         model_lower = model_name.lower()
         
         # Extract size indicators from model name
         # Patterns: llama3.2:1b, qwen2.5:14b, llama3.1:70b, etc.
         
-        # Look for patterns like :1b, :7b, :14b, :32b, :70b
-        size_match = re.search(r':(\d+)b', model_lower)
-        if size_match:
-            return int(size_match.group(1))
-        
-        # Look for patterns like -1b, -7b, etc.
-        size_match = re.search(r'-(\d+)b', model_lower)
+        # The tag (e.g. :1b, :7b, :70b) is the most reliable size indicator
+        size_match = _TAG_SIZE_RE.search(model_lower)
         if size_match:
             return int(size_match.group(1))
         
-        # Look for patterns like 1b, 7b, 14b in the name
-        size_match = re.search(r'(\d+)b', model_lower)
+        # Otherwise look for patterns like -7b or 7b anywhere in the name
+        size_match = _SIZE_RE.search(model_lower)
         if size_match:
             return int(size_match.group(1))
         
-        # Default: assume larger models if no size found (prioritize known small models)
-        if any(x in model_lower for x in ['1b', '1.5b', '2b', '3b']):
-            return 1
-        elif any(x in model_lower for x in ['7b', '8b']):
-            return 7
-        elif any(x in model_lower for x in ['13b', '14b']):
-            return 14
-        elif any(x in model_lower for x in ['32b', '34b']):
-            return 32
-        elif any(x in model_lower for x in ['70b', '72b']):
-            return 70
-        
         # Unknown size - assume medium (will be sorted after known small models)
         return 50
     
-    def get_available_models(self, force_refresh: bool = False) -> List[str]:
+    def get_available_models(self, force_refresh: bool = False) -> Tuple[str, ...]:
         """
         Get available models from Ollama API
         
@@ -86,106 +114,97 @@ class OllamaProvider(AIProvider):
             force_refresh: If True, clear cache and fetch fresh data
         
         Returns:
-            List of available model names (sorted by name)
+            Available model names (sorted by name). The tuple is shared
+            with the cache, so callers never need to copy it.
         """
-        print(f"[OllamaProvider.get_available_models] Called with force_refresh={force_refresh}")
-        print(f"[OllamaProvider.get_available_models] Cache status: {self._cached_models is not None}")
+        logger.debug("get_available_models called (force_refresh=%s, cached=%s)",
+                     force_refresh, self._cache is not None)
         
-        # Clear cache if force refresh is requested
-        if force_refresh:
-            print(f"[OllamaProvider.get_available_models] Clearing cache due to force_refresh")
-            self.clear_cache()
+        cached = self._model_list(force_refresh)
+        return cached.models if cached is not None else ()
+    
+    def _refresh_models(self) -> Optional[ModelList]:
+        """
+        Fetch the model list from /api/tags and store it in the cache
         
-        # Return cached models if available
-        if self._cached_models is not None:
-            print(f"[OllamaProvider.get_available_models] Returning {len(self._cached_models)} cached models")
-            return sorted(self._cached_models)  # Sort by name
+        Callers must hold self._models_lock.
         
-        print(f"[OllamaProvider.get_available_models] No cache, fetching from API...")
-        print(f"[OllamaProvider.get_available_models] Making GET request to: {self.tags_endpoint}")
+        Returns:
+            The new model list (sorted by name), or None on failure
+        """
+        logger.debug("Fetching Ollama models from %s", self.tags_endpoint)
+        now = time.monotonic()
         
         try:
-            import time
             start_time = time.time()
-            response = requests.get(self.tags_endpoint, timeout=10)
+            response = self._session.get(self.tags_endpoint, timeout=10)
             elapsed = time.time() - start_time
             
-            print(f"[OllamaProvider.get_available_models] Request completed in {elapsed:.2f}s")
-            print(f"[OllamaProvider.get_available_models] Response status: {response.status_code}")
-            print(f"[OllamaProvider.get_available_models] Response headers: {dict(response.headers)}")
+            logger.debug("Ollama tags request completed in %.2fs with status %d",
+                         elapsed, response.status_code)
             
             if response.status_code == 200:
                 try:
-                    data = response.json()
-                    print(f"[OllamaProvider.get_available_models] Response JSON keys: {list(data.keys()) if isinstance(data, dict) else 'Not a dict'}")
-                    print(f"[OllamaProvider.get_available_models] Full response data:\n{json.dumps(data, indent=2)}")
+                    data = orjson.loads(response.content)
+                    logger.debug("Ollama tags response: %s", data)
                     
                     models = []
+                    metadata: Dict[str, Dict] = {}
                     
                     if "models" in data:
                         if isinstance(data["models"], list):
-                            print(f"[OllamaProvider.get_available_models] Found 'models' key with {len(data['models'])} items")
-                            for idx, model_info in enumerate(data["models"]):
-                                print(f"[OllamaProvider.get_available_models] Processing model {idx + 1}: {model_info}")
+                            for model_info in data["models"]:
                                 # Ollama returns model info with 'name' or 'model' field
                                 model_name = model_info.get("name") or model_info.get("model")
                                 if model_name:
                                     models.append(model_name)
                                     # Store model metadata (size, etc.)
                                     size = model_info.get("size", 0)
-                                    self._model_metadata[model_name] = {
+                                    metadata[model_name] = {
                                         "size": size,
                                         "estimated_params": self._estimate_model_size(model_name)
                                     }
-                                    print(f"[OllamaProvider.get_available_models] ✓ Added model: {model_name} (estimated: {self._estimate_model_size(model_name)}B params)")
                                 else:
-                                    print(f"[OllamaProvider.get_available_models] ✗ Warning: Model info missing name/model field. Full info: {json.dumps(model_info, indent=2)}")
+                                    logger.warning("Ollama model info missing name/model field: %s", model_info)
                         else:
-                            print(f"[OllamaProvider.get_available_models] ✗ Warning: 'models' key exists but is not a list. Type: {type(data['models'])}, Value: {data['models']}")
+                            logger.warning("Ollama 'models' key is not a list (type: %s)",
+                                           type(data["models"]).__name__)
                     else:
-                        print(f"[OllamaProvider.get_available_models] ✗ Warning: Response missing 'models' key")
-                        print(f"[OllamaProvider.get_available_models] Available keys: {list(data.keys()) if isinstance(data, dict) else 'Not a dict'}")
+                        logger.warning("Ollama tags response missing 'models' key (keys: %s)",
+                                       list(data.keys()) if isinstance(data, dict) else "not a dict")
                     
-                    # Sort models by name
-                    models = sorted(models)
-                    print(f"[OllamaProvider.get_available_models] Total models found and sorted: {len(models)}")
-                    print(f"[OllamaProvider.get_available_models] Models list: {models}")
+                    # Sort models by name once, at store time
+                    models = tuple(sorted(models))
+                    logger.debug("Found %d Ollama models: %s", len(models), models)
                     
-                    self._cached_models = models
-                    return models
-                except json.JSONDecodeError as json_err:
-                    print(f"[OllamaProvider.get_available_models] ✗ JSON decode error: {str(json_err)}")
-                    print(f"[OllamaProvider.get_available_models] Response text (first 1000 chars): {response.text[:1000]}")
-                    return []
+                    self._model_metadata = metadata
+                    cached = self._new_model_list(now, models)
+                    self._cache = cached
+                    if models:
+                        self._save_models_snapshot(models)
+                    return cached
+                except orjson.JSONDecodeError as json_err:
+                    logger.warning("Invalid JSON from Ollama tags endpoint: %s (body: %.1000s)",
+                                   json_err, response.text)
+                    return None
             else:
                 # If API call fails, log the error
-                error_text = response.text[:500] if response.text else "No error message"
-                print(f"[OllamaProvider.get_available_models] ✗ Error: Ollama API returned status {response.status_code}")
-                print(f"[OllamaProvider.get_available_models] Error response: {error_text}")
-                return []
+                logger.warning("Ollama API returned status %d: %.500s",
+                               response.status_code, response.text or "No error message")
+                return None
         
         except requests.exceptions.Timeout as e:
-            print(f"[OllamaProvider.get_available_models] ✗ Timeout error connecting to Ollama at {self.tags_endpoint}")
-            print(f"[OllamaProvider.get_available_models] Timeout details: {str(e)}")
-            return []
+            logger.warning("Timeout connecting to Ollama at %s: %s", self.tags_endpoint, e)
+            return None
         except requests.exceptions.ConnectionError as e:
-            print(f"[OllamaProvider.get_available_models] ✗ Connection error to Ollama at {self.tags_endpoint}")
-            print(f"[OllamaProvider.get_available_models] Connection error details: {str(e)}")
-            print(f"[OllamaProvider.get_available_models] Error type: {type(e).__name__}")
-            return []
+            logger.warning("Connection error to Ollama at %s: %s", self.tags_endpoint, e)
+            return None
         except requests.exceptions.RequestException as e:
-            print(f"[OllamaProvider.get_available_models] ✗ Request exception when fetching Ollama models")
-            print(f"[OllamaProvider.get_available_models] Request exception details: {str(e)}")
-            print(f"[OllamaProvider.get_available_models] Exception type: {type(e).__name__}")
-            return []
-        except Exception as e:
-            print(f"[OllamaProvider.get_available_models] ✗ Unexpected error when fetching Ollama models")
-            print(f"[OllamaProvider.get_available_models] Error: {str(e)}")
-            print(f"[OllamaProvider.get_available_models] Exception type: {type(e).__name__}")
-            import traceback
-            print(f"[OllamaProvider.get_available_models] Full traceback:")
-            traceback.print_exc()
-            return []
+            logger.warning("Request to Ollama failed (%s): %s", type(e).__name__, e)
+            return None
+        except Exception:
+            logger.exception("Unexpected error when fetching Ollama models")
+            return None
     
     def get_default_model(self) -> str:
         """
@@ -194,22 +213,18 @@ class OllamaProvider(AIProvider):
         Returns:
             Default model name (preferring smaller models)
         """
-        available_models = self.get_available_models()
+        # Read the list once; the size order was computed with it at fetch time
+        cached = self._model_list()
         
-        if available_models:
-            # Sort models by estimated size (smallest first) to prefer smaller models
+        if cached is not None and cached.by_size:
+            # Prefer the smallest model
             # This helps avoid CUDA_Host buffer allocation errors
-            sorted_models = sorted(
-                available_models,
-                key=lambda m: self._estimate_model_size(m)
-            )
-            preferred_model = sorted_models[0]
-            print(f"[OllamaProvider.get_default_model] Selected model: {preferred_model} (estimated {self._estimate_model_size(preferred_model)}B params)")
-            print(f"[OllamaProvider.get_default_model] Available models sorted by size: {[(m, self._estimate_model_size(m)) for m in sorted_models[:5]]}")
+            preferred_model = cached.by_size[0]
+            logger.debug("Selected default Ollama model: %s", preferred_model)
             return preferred_model
         
         # Fallback model if API is unavailable
-        print(f"[OllamaProvider.get_default_model] No models available, using fallback: llama3.2:1b")
+        logger.debug("No Ollama models available, using fallback: llama3.2:1b")
         return "llama3.2:1b"
     
     def generate_response_with_messages(
@@ -232,58 +247,111 @@ class OllamaProvider(AIProvider):
         """
         selected_model = model or self.get_default_model()
         
-        # Convert messages to Ollama format
-        ollama_messages = []
-        for msg in messages:
-            # Ollama expects 'role' and 'content' (already in correct format)
-            ollama_messages.append({
-                "role": msg["role"],
-                "content": msg["content"]
-            })
-        
         request_body = {
             "model": selected_model,
-            "messages": ollama_messages,
+            # Ollama takes role/content dicts as-is; no need to copy the history
+            "messages": messages,
             "stream": False
         }
         
         try:
-            response = requests.post(
+            response = self._session.post(
                 self.chat_endpoint,
-                json=request_body,
-                headers={"Content-Type": "application/json"},
+                data=orjson.dumps(request_body),
                 timeout=120  # Longer timeout for AI generation
             )
             
             if response.status_code == 200:
-                data = response.json()
+                try:
+                    data = orjson.loads(response.content)
+                except orjson.JSONDecodeError as e:
+                    # e.g. a truncated body; not a client error
+                    raise Exception(f"Invalid response from Ollama: {e}") from e
                 # Ollama chat API returns message in 'message' field with 'content'
                 message = data.get("message", {})
                 return message.get("content", "")
             else:
-                error_data = response.json() if response.content else {}
-                error_msg = error_data.get("error", f"Ollama API error: {response.status_code}")
-                
-                # Check for memory-related errors
-                error_lower = error_msg.lower()
-                if any(keyword in error_lower for keyword in ["memory", "buffer", "allocate", "cuda", "out of memory"]):
-                    raise Exception(
-                        f"Memory error loading model '{selected_model}': {error_msg}. "
-                        f"Try using a smaller model. Available models: {', '.join(self.get_available_models()[:5])}"
-                    )
-                
-                raise Exception(error_msg)
+                raise self._wrap_memory_error(self._error_message(response), selected_model)
         
         except requests.exceptions.RequestException as e:
             error_str = str(e)
             # Check for memory-related connection errors
-            if "buffer" in error_str.lower() or "allocate" in error_str.lower():
+            error_lower = error_str.lower()
+            if "buffer" in error_lower or "allocate" in error_lower:
                 raise Exception(
                     f"Memory allocation error with model '{selected_model}': {error_str}. "
                     f"Try using a smaller model."
                 )
             raise Exception(f"Failed to connect to Ollama: {error_str}")
     
+    @staticmethod
+    def _error_message(response: requests.Response) -> str:
+        """
+        Extract the error message from a non-200 Ollama response
+        
+        Ollama reports errors as {"error": "..."}; anything else (e.g. an
+        HTML 502 page from a proxy) is reported by status and body text.
+        
+        Args:
+            response: Failed response
+        
+        Returns:
+            Error message
+        """
+        fallback = f"Ollama API error: {response.status_code}"
+        try:
+            error_data = orjson.loads(response.content) if response.content else {}
+        except orjson.JSONDecodeError:
+            body = response.text[:200].strip()
+            return f"{fallback} - {body}" if body else fallback
+        if not isinstance(error_data, dict):
+            return fallback
+        return error_data.get("error", fallback)
+    
+    def _wrap_memory_error(self, error_msg: str, model: str) -> Exception:
+        """
+        Build the exception for an Ollama API error response
+        
+        Memory-related failures (the model didn't fit) get a hint to use a
+        smaller model, listing a few available ones.
+        
+        Args:
+            error_msg: Error message returned by Ollama
+            model: Model the request was made with
+        
+        Returns:
+            Exception to raise
+        """
+        error_lower = error_msg.lower()
+        if any(keyword in error_lower for keyword in _MEM_KEYWORDS):
+            return Exception(
+                f"Memory error loading model '{model}': {error_msg}. "
+                f"Try using a smaller model. Available models: {', '.join(islice(self.get_available_models(), 5))}"
+            )
+        return Exception(error_msg)
+    
+    @staticmethod
+    def _parse_stream_line(line: bytes) -> str:
+        """
+        Extract the generated text from one line of an Ollama chat stream
+        
+        Args:
+            line: Raw JSON line (may be blank)
+        
+        Returns:
+            Chunk text, or an empty string for blank/invalid lines
+        """
+        if not line.strip():
+            return ""
+        try:
+            # orjson parses the raw bytes; no decode step
+            chunk_data = orjson.loads(line)
+        except orjson.JSONDecodeError:
+            # Skip invalid JSON lines
+            return ""
+        # Ollama chat API returns chunks in 'message.content' field
+        return chunk_data.get("message", {}).get("content", "")
+    
     def stream_response_with_messages(
         self,
         messages: List[Dict[str, str]],
@@ -304,62 +372,49 @@ class OllamaProvider(AIProvider):
         """
         selected_model = model or self.get_default_model()
         
-        # Convert messages to Ollama format
-        ollama_messages = []
-        for msg in messages:
-            # Ollama expects 'role' and 'content' (already in correct format)
-            ollama_messages.append({
-                "role": msg["role"],
-                "content": msg["content"]
-            })
-        
         request_body = {
             "model": selected_model,
-            "messages": ollama_messages,
+            # Ollama takes role/content dicts as-is; no need to copy the history
+            "messages": messages,
             "stream": True
         }
         
         try:
-            response = requests.post(
+            # Closing the response returns the pooled connection even if the
+            # client disconnects before the stream is fully read
+            with self._session.post(
                 self.chat_endpoint,
-                json=request_body,
-                headers={"Content-Type": "application/json"},
+                data=orjson.dumps(request_body),
                 stream=True,
                 timeout=120
-            )
-            
-            if response.status_code != 200:
-                error_data = response.json() if response.content else {}
-                error_msg = error_data.get("error", f"Ollama API error: {response.status_code}")
+            ) as response:
+                if response.status_code != 200:
+                    raise self._wrap_memory_error(self._error_message(response), selected_model)
                 
-                # Check for memory-related errors
-                error_lower = error_msg.lower()
-                if any(keyword in error_lower for keyword in ["memory", "buffer", "allocate", "cuda", "out of memory"]):
-                    raise Exception(
-                        f"Memory error loading model '{selected_model}': {error_msg}. "
-                        f"Try using a smaller model. Available models: {', '.join(self.get_available_models()[:5])}"
-                    )
-                
-                raise Exception(error_msg)
-            
-            # Stream the response
-            for line in response.iter_lines():
-                if line:
-                    try:
-                        chunk_data = json.loads(line.decode('utf-8'))
-                        # Ollama chat API returns chunks in 'message.content' field
-                        message = chunk_data.get("message", {})
-                        chunk_text = message.get("content", "")
+                # Stream the response. Ollama sends one JSON object per line;
+                # read in large chunks and split on newlines ourselves rather
+                # than going through iter_lines()
+                buffer = bytearray()
+                for chunk in response.iter_content(chunk_size=8192):
+                    buffer += chunk
+                    start = 0
+                    while (newline := buffer.find(b"\n", start)) != -1:
+                        chunk_text = self._parse_stream_line(buffer[start:newline])
+                        start = newline + 1
                         if chunk_text:
                             yield chunk_text
-                    except json.JSONDecodeError:
-                        # Skip invalid JSON lines
-                        continue
+                    del buffer[:start]
+                
+                # Final line without a trailing newline
+                chunk_text = self._parse_stream_line(buffer)
+                if chunk_text:
+                    yield chunk_text
         
         except requests.exceptions.RequestException as e:
             error_str = str(e)
             # Check for memory-related connection errors
-            if "buffer" in error_str.lower() or "allocate" in error_str.lower():
+            error_lower = error_str.lower()
+            if "buffer" in error_lower or "allocate" in error_lower:
                 raise Exception(
                     f"Memory allocation error with model '{selected_model}': {error_str}. "
                     f"Try using a smaller model."
@@ -1,36 +1,211 @@
 """
 Security service client for token validation
 """
+from concurrent.futures import Future
+import hmac
+import orjson
 import requests
 import logging
-from typing import Dict, Optional
+import threading
+from types import MappingProxyType
+from typing import Callable, Dict, Hashable, Mapping, Optional
+from urllib3.util.retry import Retry
 from app.config import config
+from app.services.circuit_breaker import CircuitBreaker, CircuitOpenError
+from app.services.http import create_session
+from app.services.token_cache import TokenCache
 
-# Set up logging
-logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+_BEARER_PREFIX = "Bearer "
+
+# Prefixes identifying API keys issued by the security service. They all
+# have the same length, so a key is recognized with one slice + set lookup
+_API_KEY_PREFIXES = frozenset({"sk_live_", "sk_test_"})
+_API_KEY_PREFIX_LEN = 8
+
+# Endpoints on the configured security service, built once per process
+_VALIDATE_URL = f"{config.SECURITY_SERVICE_URL}/api/v1/validate"
+_CHECK_URL = f"{config.SECURITY_SERVICE_URL}/api/v1/validate/check"
+_API_KEY_VALIDATE_URL = f"{config.SECURITY_SERVICE_URL}/api/v1/apikeys/validate"
+
+# Fixed at startup; encoded once for constant-time comparison
+_HARDCODED_API_KEY = (config.HARDCODED_API_KEY or "").encode("utf-8")
+# Shared, read-only validation result for the hardcoded key
+_HARDCODED_KEY_INFO: Mapping = MappingProxyType({
+    "keyId": "hardcoded-key",
+    "valid": True,
+    "message": "API key validated successfully"
+})
+
+
+# Error message per request failure type, most specific first: ConnectTimeout
+# is both a Timeout and a ConnectionError and should read as a timeout
+_REQUEST_ERROR_MESSAGES = (
+    (requests.exceptions.Timeout, "Timeout connecting to security service"),
+    (requests.exceptions.ConnectionError, "Failed to connect to security service"),
+)
+
+
+def _request_error_message(error: requests.exceptions.RequestException) -> str:
+    """Describe a failed request to the security service"""
+    for error_type, message in _REQUEST_ERROR_MESSAGES:
+        if isinstance(error, error_type):
+            return message
+    return "Failed to connect to security service"
+
 
 class SecurityServiceError(Exception):
     """Exception raised when security service validation fails"""
     pass
 
 
+def _json_body(response: requests.Response) -> Dict:
+    """
+    Decode a security service response body
+    
+    orjson parses the raw bytes directly, skipping the text decode and
+    stdlib parser behind response.json().
+    
+    Raises:
+        SecurityServiceError: If the body is not valid JSON
+    """
+    try:
+        return orjson.loads(response.content)
+    except orjson.JSONDecodeError as e:
+        raise SecurityServiceError(f"Invalid response from security service: {e}") from e
+
+
 class SecurityClient:
     """Client for interacting with security-service"""
     
     def __init__(self, base_url: Optional[str] = None, application_id: Optional[str] = None):
         self.base_url = base_url or config.SECURITY_SERVICE_URL
         self.application_id = application_id or config.SECURITY_APPLICATION_ID
-        self.validate_endpoint = f"{self.base_url}/api/v1/validate"
-        self.check_endpoint = f"{self.base_url}/api/v1/validate/check"
-        self.api_key_validate_endpoint = f"{self.base_url}/api/v1/apikeys/validate"
+        if self.base_url == config.SECURITY_SERVICE_URL:
+            self.validate_endpoint = _VALIDATE_URL
+            self.check_endpoint = _CHECK_URL
+            self.api_key_validate_endpoint = _API_KEY_VALIDATE_URL
+        else:
+            self.validate_endpoint = f"{self.base_url}/api/v1/validate"
+            self.check_endpoint = f"{self.base_url}/api/v1/validate/check"
+            self.api_key_validate_endpoint = f"{self.base_url}/api/v1/apikeys/validate"
+        self._session = self._create_session(config.SECURITY_SERVICE_POOL_SIZE)
+        # Stop calling the service for a while after repeated connection
+        # failures or timeouts; rejected credentials don't count
+        self._breaker = CircuitBreaker(
+            fail_max=config.SECURITY_SERVICE_BREAKER_FAILURES,
+            reset_timeout=config.SECURITY_SERVICE_BREAKER_RESET,
+            failure_types=(requests.exceptions.RequestException,)
+        )
+        # Validations currently in flight, see _singleflight()
+        self._inflight: Dict[Hashable, Future] = {}
+        self._inflight_lock = threading.Lock()
+    
+    @staticmethod
+    def _create_session(pool_size: int) -> requests.Session:
+        """
+        Create a pooled HTTP session so keep-alive connections to the
+        security service are reused across requests
+        
+        Validation requests all send JSON, so Content-Type is a session
+        default rather than a per-call header.
+        
+        Args:
+            pool_size: Maximum number of connections kept per host
+        
+        Returns:
+            Configured requests session
+        """
+        # Validation POSTs are retried on gateway errors only. Read errors
+        # are raised as-is rather than retried (a retry would multiply the
+        # 5s timeout before the circuit breaker records a failure), and a
+        # failed connect is retried once
+        retry = Retry(
+            total=2,
+            connect=1,
+            read=False,
+            backoff_factor=0.1,
+            status_forcelist=[502, 503, 504],
+            allowed_methods=frozenset({"GET", "POST"}),
+            raise_on_status=False
+        )
+        return create_session(
+            pool_connections=32,
+            pool_maxsize=pool_size,
+            max_retries=retry,
+            headers={"Connection": "keep-alive", "Content-Type": "application/json"}
+        )
+    
+    def _post(self, url: str, body: bytes) -> requests.Response:
+        """
+        POST a JSON body to the security service through the circuit breaker
+        
+        While the breaker is open the request is not sent; the caller sees
+        a ConnectionError right away and takes its usual fallback path
+        (e.g. the hardcoded API key) instead of waiting for a timeout.
+        
+        Args:
+            url: Endpoint URL
+            body: Serialized JSON request body
+        
+        Returns:
+            Response from the security service
+        
+        Raises:
+            requests.exceptions.RequestException: If the request fails or
+                the breaker is open
+        """
+        try:
+            return self._breaker.call(self._session.post, url, data=body, timeout=5)
+        except CircuitOpenError as e:
+            raise requests.exceptions.ConnectionError(str(e)) from e
+    
+    def _singleflight(self, key: Hashable, call: Callable[[], Dict]) -> Dict:
+        """
+        Run a validation call, sharing its outcome with concurrent callers
+        
+        While a call for `key` is in flight, other threads asking for the
+        same key wait for it and get the same result (or exception)
+        instead of sending a duplicate request. Nothing is kept once the
+        call finishes; caching results is the middleware's job.
+        
+        Args:
+            key: Identifies the credential, path and method being validated
+            call: Performs the actual validation
+        
+        Returns:
+            Validation result
+        
+        Raises:
+            SecurityServiceError: If validation fails
+        """
+        with self._inflight_lock:
+            future = self._inflight.get(key)
+            leader = future is None
+            if leader:
+                future = self._inflight[key] = Future()
+        
+        if not leader:
+            return future.result()
+        
+        try:
+            result = call()
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            with self._inflight_lock:
+                del self._inflight[key]
     
     def is_security_service_enabled(self) -> bool:
         """Check if security service is enabled"""
         return config.ENABLE_SECURITY_SERVICE
     
-    def validate_hardcoded_api_key(self, api_key: str) -> Dict:
+    def validate_hardcoded_api_key(self, api_key: str) -> Mapping:
         """
         Validate API key against hardcoded key from config
         
@@ -38,23 +213,20 @@ class SecurityClient:
             api_key: API key string to validate
         
         Returns:
-            Dictionary containing validation response with key info
+            Read-only mapping with key info, in the security service's
+            response format
         
         Raises:
             SecurityServiceError: If validation fails
         """
-        if not config.HARDCODED_API_KEY:
+        if not _HARDCODED_API_KEY:
             raise SecurityServiceError("Hardcoded API key not configured")
         
-        if api_key != config.HARDCODED_API_KEY:
+        # Constant-time comparison so response timing doesn't leak the key
+        if not hmac.compare_digest(api_key.encode("utf-8"), _HARDCODED_API_KEY):
             raise SecurityServiceError("Invalid API key")
         
-        # Return a response similar to security service format
-        return {
-            "keyId": "hardcoded-key",
-            "valid": True,
-            "message": "API key validated successfully"
-        }
+        return _HARDCODED_KEY_INFO
     
     def validate_token(
         self, 
@@ -84,9 +256,29 @@ class SecurityClient:
             )
         
         # Remove 'Bearer ' prefix if present
-        if token.startswith("Bearer "):
-            token = token[7:]
+        token = token.removeprefix(_BEARER_PREFIX)
+        
+        # Concurrent requests with the same token share one round-trip
+        return self._singleflight(
+            ("token",) + TokenCache.make_key(token, path, method),
+            lambda: self._request_token_validation(token, path, method)
+        )
+    
+    def _request_token_validation(self, token: str, path: str, method: str) -> Dict:
+        """
+        Send a token validation request to the security service
+        
+        Args:
+            token: JWT token or session ID (without 'Bearer ' prefix)
+            path: Resource path being accessed
+            method: HTTP method (GET, POST, etc.)
         
+        Returns:
+            Dictionary containing validation response with user info
+        
+        Raises:
+            SecurityServiceError: If validation fails
+        """
         # Prepare validation request (use snake_case to match ValidationRequest record)
         validation_request = {
             "token": token,
@@ -96,58 +288,53 @@ class SecurityClient:
         }
         
         try:
-            logger.debug(f"Validating token with security service: {self.validate_endpoint}")
-            logger.debug(f"Request: applicationId={self.application_id}, path={path}, method={method}")
+            logger.debug("Validating token with security service: %s", self.validate_endpoint)
+            logger.debug("Request: applicationId=%s, path=%s, method=%s", self.application_id, path, method)
             
-            response = requests.post(
-                self.validate_endpoint,
-                json=validation_request,
-                headers={"Content-Type": "application/json"},
-                timeout=5
-            )
+            response = self._post(self.validate_endpoint, orjson.dumps(validation_request))
             
-            logger.debug(f"Security service response: status={response.status_code}")
+            logger.debug("Security service response: status=%s", response.status_code)
             
             if response.status_code == 200:
-                return response.json()
+                return _json_body(response)
             elif response.status_code == 401:
-                error_data = response.json() if response.content else {}
+                error_data = _json_body(response) if response.content else {}
                 error_msg = error_data.get("message", "Token is invalid or expired")
-                logger.warning(f"Token validation failed (401): {error_msg}")
+                logger.warning("Token validation failed (401): %s", error_msg)
                 raise SecurityServiceError(error_msg)
             elif response.status_code == 403:
-                error_data = response.json() if response.content else {}
+                error_data = _json_body(response) if response.content else {}
                 error_msg = error_data.get("message", "Access denied")
-                logger.warning(f"Access denied (403): {error_msg}")
+                logger.warning("Access denied (403): %s", error_msg)
                 raise SecurityServiceError(error_msg)
             else:
                 error_msg = f"Security service error: {response.status_code}"
                 try:
-                    error_data = response.json()
+                    error_data = orjson.loads(response.content)
                     error_msg = error_data.get("message", error_msg)
                 except:
                     error_msg = f"Security service error: {response.status_code} - {response.text[:200]}"
-                logger.error(f"Unexpected security service response: {error_msg}")
+                logger.error("Unexpected security service response: %s", error_msg)
                 raise SecurityServiceError(error_msg)
         
         except requests.exceptions.Timeout as e:
-            logger.error(f"Timeout connecting to security service at {self.validate_endpoint}")
-            logger.error(f"Base URL: {self.base_url}, Application ID: {self.application_id}")
+            logger.error("Timeout connecting to security service at %s", self.validate_endpoint)
+            logger.error("Base URL: %s, Application ID: %s", self.base_url, self.application_id)
             # If hardcoded key is available, allow fallback
             if config.HARDCODED_API_KEY:
                 logger.warning("Security service timeout, but hardcoded API key is available for fallback")
             raise SecurityServiceError(f"Timeout connecting to security service: {str(e)}")
         except requests.exceptions.ConnectionError as e:
-            logger.error(f"Connection error to security service at {self.validate_endpoint}")
-            logger.error(f"Base URL: {self.base_url}, Application ID: {self.application_id}")
-            logger.error(f"Error details: {str(e)}")
+            logger.error("Connection error to security service at %s", self.validate_endpoint)
+            logger.error("Base URL: %s, Application ID: %s", self.base_url, self.application_id)
+            logger.error("Error details: %s", e)
             # If hardcoded key is available, allow fallback
             if config.HARDCODED_API_KEY:
                 logger.warning("Security service connection failed, but hardcoded API key is available for fallback")
             raise SecurityServiceError(f"Failed to connect to security service: {str(e)}")
         except requests.exceptions.RequestException as e:
-            logger.error(f"Request exception to security service at {self.validate_endpoint}: {str(e)}")
-            logger.error(f"Base URL: {self.base_url}, Application ID: {self.application_id}")
+            logger.error("Request exception to security service at %s: %s", self.validate_endpoint, e)
+            logger.error("Base URL: %s, Application ID: %s", self.base_url, self.application_id)
             # If hardcoded key is available, allow fallback
             if config.HARDCODED_API_KEY:
                 logger.warning("Security service request failed, but hardcoded API key is available for fallback")
@@ -167,11 +354,10 @@ class SecurityClient:
             SecurityServiceError: If validation fails
         """
         # Remove 'Bearer ' prefix if present
-        if token.startswith("Bearer "):
-            token = token[7:]
+        token = token.removeprefix(_BEARER_PREFIX)
         
         try:
-            response = requests.get(
+            response = self._session.get(
                 self.check_endpoint,
                 params={
                     "token": token,
@@ -181,7 +367,7 @@ class SecurityClient:
             )
             
             if response.status_code == 200:
-                return response.json()
+                return _json_body(response)
             elif response.status_code == 401:
                 raise SecurityServiceError("Token is invalid or expired")
             elif response.status_code == 403:
@@ -189,7 +375,7 @@ class SecurityClient:
             else:
                 error_msg = f"Security service error: {response.status_code}"
                 try:
-                    error_data = response.json()
+                    error_data = orjson.loads(response.content)
                     error_msg = error_data.get("message", error_msg)
                 except:
                     pass
@@ -223,6 +409,33 @@ class SecurityClient:
             logger.debug("Security service disabled, validating against hardcoded API key")
             return self.validate_hardcoded_api_key(api_key)
         
+        # Concurrent requests with the same key share one round-trip
+        return self._singleflight(
+            ("api_key",) + TokenCache.make_key(api_key, resource_path or "", http_method or ""),
+            lambda: self._request_api_key_validation(api_key, resource_path, http_method)
+        )
+    
+    def _request_api_key_validation(
+        self,
+        api_key: str,
+        resource_path: Optional[str],
+        http_method: Optional[str]
+    ) -> Dict:
+        """
+        Send an API key validation request to the security service, falling
+        back to the hardcoded key if the service can't be reached
+        
+        Args:
+            api_key: API key string
+            resource_path: Optional resource path being accessed
+            http_method: Optional HTTP method (GET, POST, etc.)
+        
+        Returns:
+            Dictionary containing validation response with key info
+        
+        Raises:
+            SecurityServiceError: If validation fails
+        """
         # Try security service first
         try:
             # Prepare validation request
@@ -233,38 +446,33 @@ class SecurityClient:
                 "http_method": http_method
             }
             
-            logger.debug(f"Validating API key with security service: {self.api_key_validate_endpoint}")
+            logger.debug("Validating API key with security service: %s", self.api_key_validate_endpoint)
             
-            response = requests.post(
-                self.api_key_validate_endpoint,
-                json=validation_request,
-                headers={"Content-Type": "application/json"},
-                timeout=5
-            )
+            response = self._post(self.api_key_validate_endpoint, orjson.dumps(validation_request))
             
-            logger.debug(f"API key validation response: status={response.status_code}")
+            logger.debug("API key validation response: status=%s", response.status_code)
             
             if response.status_code == 200:
-                return response.json()
+                return _json_body(response)
             elif response.status_code == 403:
-                error_data = response.json() if response.content else {}
+                error_data = _json_body(response) if response.content else {}
                 error_msg = error_data.get("message", "API key is invalid or does not have access")
-                logger.warning(f"API key validation failed (403): {error_msg}")
+                logger.warning("API key validation failed (403): %s", error_msg)
                 raise SecurityServiceError(error_msg)
             else:
                 error_msg = f"Security service error: {response.status_code}"
                 try:
-                    error_data = response.json()
+                    error_data = orjson.loads(response.content)
                     error_msg = error_data.get("message", error_msg)
                 except:
                     error_msg = f"Security service error: {response.status_code} - {response.text[:200]}"
-                logger.error(f"Unexpected security service response: {error_msg}")
+                logger.error("Unexpected security service response: %s", error_msg)
                 raise SecurityServiceError(error_msg)
         
-        except (requests.exceptions.Timeout, requests.exceptions.ConnectionError, requests.exceptions.RequestException) as e:
+        except requests.exceptions.RequestException as e:
             # If security service fails but hardcoded key is available, fall back
             if config.HARDCODED_API_KEY:
-                logger.warning(f"Security service unavailable ({str(e)}), falling back to hardcoded API key")
+                logger.warning("Security service unavailable (%s), falling back to hardcoded API key", e)
                 try:
                     return self.validate_hardcoded_api_key(api_key)
                 except SecurityServiceError:
@@ -272,15 +480,9 @@ class SecurityClient:
                     pass
             
             # Log and raise original error
-            if isinstance(e, requests.exceptions.Timeout):
-                logger.error(f"Timeout connecting to security service at {self.api_key_validate_endpoint}")
-                raise SecurityServiceError(f"Timeout connecting to security service: {str(e)}")
-            elif isinstance(e, requests.exceptions.ConnectionError):
-                logger.error(f"Connection error to security service at {self.api_key_validate_endpoint}")
-                raise SecurityServiceError(f"Failed to connect to security service: {str(e)}")
-            else:
-                logger.error(f"Request exception to security service at {self.api_key_validate_endpoint}: {str(e)}")
-                raise SecurityServiceError(f"Failed to connect to security service: {str(e)}")
+            message = _request_error_message(e)
+            logger.error("%s at %s: %s", message, self.api_key_validate_endpoint, e)
+            raise SecurityServiceError(f"{message}: {str(e)}")
     
     def is_api_key(self, token: str) -> bool:
         """
@@ -295,10 +497,27 @@ class SecurityClient:
         if not token:
             return False
         # Remove Bearer prefix if present
-        clean_token = token.replace("Bearer ", "").strip()
-        return clean_token.startswith("sk_live_") or clean_token.startswith("sk_test_")
+        clean_token = token.removeprefix(_BEARER_PREFIX).strip()
+        return clean_token[:_API_KEY_PREFIX_LEN] in _API_KEY_PREFIXES
+
 
+# Created on first use rather than at import time, so the connection pool
+# is built inside each worker process and importing this module stays cheap
+_security_client: Optional[SecurityClient] = None
+_security_client_lock = threading.Lock()
 
-# Global instance
-security_client = SecurityClient()
+
+def get_security_client() -> SecurityClient:
+    """
+    Get the process-wide SecurityClient, creating it on first call
+    
+    Returns:
+        Shared SecurityClient instance
+    """
+    global _security_client
+    if _security_client is None:
+        with _security_client_lock:
+            if _security_client is None:
+                _security_client = SecurityClient()
+    return _security_client
 
@@ -0,0 +1,28 @@
+"""
+Location for files shared between worker processes on one host
+"""
+from pathlib import Path
+from typing import Optional
+import os
+import stat
+import tempfile
+
+
+def private_cache_dir() -> Optional[Path]:
+    """
+    Per-user directory for files shared between worker processes
+    
+    Returns:
+        The directory (created with mode 0o700), or None if it can't be
+        created or isn't private to this user, e.g. because another user
+        created it first
+    """
+    path = Path(tempfile.gettempdir()) / f"ai-service-{os.getuid()}"
+    try:
+        path.mkdir(mode=0o700, exist_ok=True)
+        info = path.lstat()
+    except OSError:
+        return None
+    if not stat.S_ISDIR(info.st_mode) or info.st_uid != os.getuid() or info.st_mode & 0o077:
+        return None
+    return path
@@ -0,0 +1,150 @@
+"""
+In-memory cache for successful authentication validation results
+"""
+import base64
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Hashable, Iterable, Optional, Tuple
+
+
+class TokenCache:
+    """
+    TTL-bounded cache of validation results keyed by (token hash, path, method)
+    
+    Only successful validations should be stored; failures must always go
+    back to the security service so revoked or mistyped credentials are
+    never pinned in memory.
+    
+    Safe to share between threads (gunicorn gthread workers); every
+    access to the underlying OrderedDict happens under a lock.
+    """
+    
+    def __init__(self, max_size: int = 10000, ttl_seconds: int = 300):
+        """
+        Initialize the cache
+        
+        Args:
+            max_size: Maximum number of entries before the oldest is evicted
+            ttl_seconds: Default lifetime of an entry in seconds
+        """
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[Hashable, Tuple[Dict, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+    
+    @staticmethod
+    def make_key(token: str, path: str, method: str) -> Tuple[bytes, str, str]:
+        """
+        Build a cache key for a credential
+        
+        The token is hashed (BLAKE2b, 32-byte digest) so the key has a fixed
+        size regardless of how long the credential is, and raw secrets are
+        not kept as dict keys.
+        Path and method are part of the key because the security service
+        checks access per resource.
+        """
+        return hashlib.blake2b(token.encode(), digest_size=32).digest(), path, method
+    
+    def get(self, key: Hashable) -> Tuple[bool, Optional[Dict]]:
+        """
+        Look up a cached validation result
+        
+        Returns:
+            Tuple of (hit, validation_result)
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return False, None
+            
+            result, expires_at = entry
+            if time.monotonic() >= expires_at:
+                self._entries.pop(key, None)
+                return False, None
+            
+            return True, result
+    
+    def set(self, key: Hashable, result: Dict, token: Optional[str] = None) -> None:
+        """
+        Store a successful validation result
+        
+        Args:
+            key: Key from make_key()
+            result: Validation result returned by the security service
+            token: Raw credential; a JWT 'exp' claim shortens the entry's
+                lifetime if it is sooner than ttl_seconds
+        """
+        ttl = self.ttl_seconds
+        exp = _jwt_expiry(token) if token else None
+        if exp is not None:
+            # The token's own expiry can only shorten the configured lifetime
+            ttl = min(self.ttl_seconds, exp - time.time())
+            if ttl <= 0:
+                return
+        
+        with self._lock:
+            self._entries[key] = (result, time.monotonic() + ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+    
+    def invalidate_many(self, key_ids: Iterable[str]) -> int:
+        """
+        Drop every entry whose validation result belongs to one of the given keys
+        
+        Args:
+            key_ids: API key IDs (the 'keyId' field of validation results)
+        
+        Returns:
+            Number of entries removed
+        """
+        targets = set(key_ids)
+        if not targets:
+            return 0
+        
+        with self._lock:
+            stale = [
+                key for key, (result, _) in self._entries.items()
+                if result.get("keyId") in targets
+            ]
+            for key in stale:
+                del self._entries[key]
+        return len(stale)
+    
+    def clear(self) -> None:
+        """Drop all cached entries"""
+        with self._lock:
+            self._entries.clear()
+    
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+def _jwt_expiry(token: str) -> Optional[float]:
+    """
+    Read the 'exp' claim from a JWT without verifying its signature
+    
+    The signature has already been checked by the security service; this
+    is only used to avoid caching a token past its own expiry.
+    
+    Returns:
+        Expiry as a Unix timestamp, or None if the token is not a JWT
+    """
+    if token.startswith("Bearer "):
+        token = token[7:]
+    
+    parts = token.split(".")
+    if len(parts) != 3:
+        return None
+    
+    try:
+        payload = parts[1]
+        payload += "=" * (-len(payload) % 4)
+        claims = json.loads(base64.urlsafe_b64decode(payload))
+        exp = claims.get("exp") if isinstance(claims, dict) else None
+        return float(exp) if exp is not None else None
+    except (ValueError, TypeError):
+        return None
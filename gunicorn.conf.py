@@ -0,0 +1,32 @@
+"""
+Gunicorn configuration for AI service
+
+Loaded automatically when gunicorn is started from the project root.
+Streaming chat holds a connection for the whole generation, so threaded
+workers are used: each worker serves up to `threads` requests at once
+instead of one.
+
+Settings can be overridden with environment variables (or CLI flags,
+which take precedence over this file).
+"""
+import os
+
+# Render.com / Cloud Run provide PORT; fall back to FLASK_PORT like app.config
+bind = f"0.0.0.0:{os.getenv('PORT') or os.getenv('FLASK_PORT', '8081')}"
+
+workers = int(os.getenv("GUNICORN_WORKERS", "4"))
+worker_class = "gthread"
+threads = int(os.getenv("GUNICORN_THREADS", "32"))
+worker_connections = 1000
+
+# Long generations can take a while before the first byte is sent
+timeout = int(os.getenv("GUNICORN_TIMEOUT", "120"))
+keepalive = 30
+
+
+def post_fork(server, worker):
+    """Initialize logging and AI providers in each worker before it accepts requests"""
+    from app.logging_config import configure_logging
+    from app.services.ai_service import get_ai_service
+    configure_logging()
+    get_ai_service()